@@ -61,13 +61,82 @@ WSGI_APPLICATION = 'adega.wsgi.application'
 
 # BANCO DE DADOS (Configuração Profissional)
 # Usa Postgres no Render (DATABASE_URL) e SQLite localmente
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+
 DATABASES = {
     'default': dj_database_url.config(
         default=f'sqlite:///{BASE_DIR / "db.sqlite3"}',
-        conn_max_age=600
+        conn_max_age=600,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
     )
 }
 
+# RÉPLICA DE LEITURA (relatórios e exportações)
+# Ex.: REPLICA_DATABASE_URL=postgres://.../adega na réplica do Postgres.
+# Para testar localmente: cp db.sqlite3 db_replica.sqlite3 e
+# REPLICA_DATABASE_URL=sqlite:///db_replica.sqlite3
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=600,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    # Nos testes a réplica é o próprio banco default
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ["estoque.routers.ReplicaRouter"]
+
+# Atraso máximo aceito na réplica (segundos); acima disso lê do default
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+# Depois de registrar uma movimentação o usuário lê do default por N segundos
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "15"))
+
+# POOL DE CONEXÕES (psycopg3 + pool nativo do Django)
+# Com DB_POOL=True cada worker do gunicorn mantém um pool limitado
+# em vez de uma conexão persistente ociosa. O pool exige CONN_MAX_AGE=0.
+DB_POOL = os.getenv("DB_POOL", "True") == "True"
+
+for _db in DATABASES.values():
+    if DB_POOL and _db['ENGINE'] == 'django.db.backends.postgresql':
+        _db['CONN_MAX_AGE'] = 0
+        # Com o pool, o Django converte CONN_HEALTH_CHECKS em
+        # check=ConnectionPool.check_connection: cada conexão é testada ao sair
+        # do pool (o psycopg_pool sozinho não testa). Não repetir "check" em
+        # OPTIONS['pool']: o Django já passa esse argumento e daria TypeError.
+        _db['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+        _db.setdefault('OPTIONS', {})['pool'] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+
+# Relatórios e exportações leem em lotes por cursor no servidor (Postgres)
+RELATORIO_CHUNK_SIZE = int(os.getenv("RELATORIO_CHUNK_SIZE", "2000"))
+
+# ESTOQUE_DELTAS=True: vendas gravam deltas (só INSERT) em vez de atualizar a
+# linha do produto. "manage.py consolidar_estoque --intervalo 30" precisa
+# rodar sempre (serviço "consolidador" no docker-compose), senão os deltas
+# se acumulam e cada leitura de estoque soma mais linhas. No admin o estoque
+# fica só leitura nesse modo.
+ESTOQUE_DELTAS = os.getenv("ESTOQUE_DELTAS", "False") == "True"
+
+# FILA DE JOBS (relatórios pesados rodam no "manage.py run_worker")
+# O worker é um processo à parte (serviço "worker" no docker-compose; no
+# Render, um Background Worker com o mesmo comando). Sem worker vivo a tela
+# de relatórios baixa o CSV direto, como antes da fila.
+JOBS_DIR = Path(os.getenv("JOBS_DIR", BASE_DIR / "relatorios_gerados"))
+# Job RODANDO sem heartbeat há mais que isso volta pra fila (worker morreu)
+JOB_TIMEOUT_SEGUNDOS = int(os.getenv("JOB_TIMEOUT_SEGUNDOS", "300"))
+# Worker sem sinal de vida há mais que isso é considerado parado
+WORKER_VIVO_SEGUNDOS = int(os.getenv("WORKER_VIVO_SEGUNDOS", "60"))
+# Arquivos de relatório prontos são apagados do disco depois disso
+JOBS_RETENCAO_HORAS = int(os.getenv("JOBS_RETENCAO_HORAS", "24"))
+
+# Curva ABC: resultado em cache por adega + período (segundos)
+ANALISE_CACHE_SEGUNDOS = int(os.getenv("ANALISE_CACHE_SEGUNDOS", "600"))
+
 # Validação de Senhas
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import Categoria, Produto, Movimentacao
+from django.conf import settings
+from django.contrib import admin, messages
+from .models import Categoria, Produto, Movimentacao, RegraPreco, HistoricoPreco, Job, Worker
+from .precificacao import aplicar_regra, previsualizar
 
 
 @admin.register(Categoria)
@@ -18,6 +20,42 @@ class ProdutoAdmin(admin.ModelAdmin):
     list_editable = ("estoque_atual", "preco_venda")
     list_per_page = 25
 
+    # Modo ESTOQUE_DELTAS: estoque_atual não é o estoque real (faltam os deltas
+    # pendentes) e quem "corrigisse" aqui veria os deltas somados de novo na
+    # consolidação. Mostra estoque_disponivel e deixa o estoque só leitura.
+    def get_list_display(self, request):
+        if settings.ESTOQUE_DELTAS:
+            return tuple("estoque_disponivel" if campo == "estoque_atual" else campo for campo in self.list_display)
+        return self.list_display
+
+    def get_readonly_fields(self, request, obj=None):
+        if settings.ESTOQUE_DELTAS:
+            return (*self.readonly_fields, "estoque_atual", "estoque_disponivel")
+        return self.readonly_fields
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        campo = super().formfield_for_dbfield(db_field, request, **kwargs)
+        # list_editable não muda por request: no modo deltas o campo vem travado
+        if db_field.name == "estoque_atual" and settings.ESTOQUE_DELTAS:
+            campo.disabled = True
+        return campo
+
+    def save_model(self, request, obj, form, change):
+        if change and settings.ESTOQUE_DELTAS:
+            # Nunca regrava estoque_atual: o valor lido pode estar velho se o
+            # consolidar_deltas somou deltas nesse meio tempo
+            campos = [f.name for f in obj._meta.concrete_fields if not f.primary_key and f.name != "estoque_atual"]
+            obj.save(update_fields=campos)
+        else:
+            super().save_model(request, obj, form, change)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_estoque()
+
+    @admin.display(description="Estoque", ordering="estoque_disponivel")
+    def estoque_disponivel(self, obj):
+        return obj.estoque_disponivel
+
 
 @admin.register(Movimentacao)
 class MovimentacaoAdmin(admin.ModelAdmin):
@@ -27,3 +65,64 @@ class MovimentacaoAdmin(admin.ModelAdmin):
     ordering = ("-data",)
     date_hierarchy = "data"
     list_per_page = 25
+
+
+@admin.register(RegraPreco)
+class RegraPrecoAdmin(admin.ModelAdmin):
+    list_display = ("categoria", "adega", "markup", "final_centavos", "ativa", "criada_em")
+    list_filter = ("ativa", "categoria")
+    ordering = ("categoria__nome",)
+    actions = ("previsualizar_precos", "aplicar_precos")
+
+    @admin.action(description="Pré-visualizar novos preços")
+    def previsualizar_precos(self, request, queryset):
+        for regra in queryset:
+            total, amostra = previsualizar(regra, limite=5)
+            exemplos = ", ".join(
+                f"{p['nome']}: {p['preco_venda']:.2f} → {p['preco_novo']:.2f}" for p in amostra
+            )
+            messages.info(request, f"{regra}: {total} produtos mudam. {exemplos}")
+
+    @admin.action(description="Aplicar regras (grava os preços)")
+    def aplicar_precos(self, request, queryset):
+        for regra in queryset:
+            if not regra.ativa:
+                messages.warning(request, f"{regra}: regra inativa, não aplicada")
+                continue
+            total = aplicar_regra(regra)
+            messages.success(request, f"✅ {regra}: {total} preços alterados")
+
+
+@admin.register(HistoricoPreco)
+class HistoricoPrecoAdmin(admin.ModelAdmin):
+    list_display = ("alterado_em", "produto", "preco_anterior", "preco_novo", "regra")
+    list_filter = ("regra",)
+    search_fields = ("produto__nome", "produto__codigo_barras")
+    ordering = ("-alterado_em",)
+    date_hierarchy = "alterado_em"
+    list_per_page = 25
+    list_select_related = ("produto", "produto__adega", "regra", "regra__categoria")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "status", "progresso", "tentativas", "worker", "criado_em", "concluido_em")
+    list_filter = ("status", "tipo")
+    ordering = ("-criado_em",)
+    readonly_fields = ("worker", "heartbeat", "arquivo", "erro", "criado_em", "concluido_em")
+    list_per_page = 25
+
+
+@admin.register(Worker)
+class WorkerAdmin(admin.ModelAdmin):
+    list_display = ("nome", "visto_em")
+    ordering = ("-visto_em",)
+
+    def has_add_permission(self, request):
+        return False
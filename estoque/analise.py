@@ -0,0 +1,112 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case, CharField, DecimalField, ExpressionWrapper, F, FloatField, Func, RowRange, Sum, Value, When,
+    Window,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Movimentacao
+
+# Corte da curva ABC: A até 80% da receita acumulada, B até 95%, resto C
+LIMITE_A = Decimal("0.80")
+LIMITE_B = Decimal("0.95")
+
+DINHEIRO = DecimalField(max_digits=14, decimal_places=2)
+
+
+class SomaJanela(Func):
+    """SUM usado como função de janela sobre um agregado (Sum() não aceita agregado dentro)."""
+    function = "SUM"
+    window_compatible = True
+    output_field = DINHEIRO
+
+
+class SemGroupBy(ExpressionWrapper):
+    """Expressão calculada só com janelas: não entra no GROUP BY."""
+
+    def get_group_by_cols(self):
+        return []
+
+
+def _classe_abc(acumulado_anterior, total):
+    return SemGroupBy(
+        Case(
+            When(GreaterThan(total * LIMITE_A, acumulado_anterior), then=Value("A")),
+            When(GreaterThan(total * LIMITE_B, acumulado_anterior), then=Value("B")),
+            default=Value("C"),
+        ),
+        output_field=CharField(),
+    )
+
+
+def curva_abc_queryset(adega, inicio, fim):
+    """
+    Receita, margem e classe ABC por produto no período, numa única query.
+    A classe é calculada no total da adega e também dentro de cada categoria.
+    """
+    receita = Sum(F("quantidade") * F("produto__preco_venda"), output_field=DINHEIRO)
+    margem = Sum(
+        F("quantidade") * (F("produto__preco_venda") - F("produto__preco_custo")),
+        output_field=DINHEIRO,
+    )
+
+    ordem = [F("receita").desc(), F("produto_id").asc()]
+    categoria = [F("produto__categoria_id")]
+
+    total = Window(SomaJanela(F("receita")))
+    anterior = Coalesce(
+        Window(SomaJanela(F("receita")), order_by=ordem, frame=RowRange(end=-1)),
+        Value(Decimal("0")),
+        output_field=DINHEIRO,
+    )
+    total_categoria = Window(SomaJanela(F("receita")), partition_by=categoria)
+    anterior_categoria = Coalesce(
+        Window(SomaJanela(F("receita")), partition_by=categoria, order_by=ordem, frame=RowRange(end=-1)),
+        Value(Decimal("0")),
+        output_field=DINHEIRO,
+    )
+
+    return (
+        Movimentacao.objects.filter(
+            adega=adega,
+            tipo="SAIDA",
+            # Meio-aberto em data/hora (e não data__date) pra usar o índice em data
+            data__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+            data__lt=timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min)),
+        )
+        .values("produto_id", "produto__nome", "produto__categoria__nome")
+        .annotate(quantidade_total=Sum("quantidade"), receita=receita, margem=margem)
+        .annotate(
+            receita_acumulada=Window(SomaJanela(F("receita")), order_by=ordem),
+            receita_total=total,
+            participacao_acumulada=SemGroupBy(
+                # Receita total 0 (tudo vendido a preço 0): NULLIF evita divisão por zero no Postgres
+                Coalesce(
+                    Cast(Window(SomaJanela(F("receita")), order_by=ordem), FloatField()) * 100.0
+                    / NullIf(Cast(total, FloatField()), Value(0.0)),
+                    Value(0.0),
+                ),
+                output_field=FloatField(),
+            ),
+            receita_categoria=total_categoria,
+            classe=_classe_abc(anterior, total),
+            classe_categoria=_classe_abc(anterior_categoria, total_categoria),
+        )
+        .order_by("-receita", "produto_id")
+    )
+
+
+def curva_abc(adega, inicio, fim):
+    """Linhas da curva ABC do período, em cache por adega + período."""
+    chave = f"analise_abc:{adega.pk}:{inicio.isoformat()}:{fim.isoformat()}"
+    linhas = cache.get(chave)
+    if linhas is None:
+        linhas = list(curva_abc_queryset(adega, inicio, fim))
+        cache.set(chave, linhas, settings.ANALISE_CACHE_SEGUNDOS)
+    return linhas
@@ -0,0 +1,44 @@
+from django.db.models import Max
+
+from .models import Produto, ProdutoRemovido
+
+# Ordem das colunas de cada produto no JSON (lista em vez de objeto = menor)
+CAMPOS = ["id", "codigo_barras", "nome", "preco_venda"]
+
+
+def versao_atual(adega):
+    """Maior versão do catálogo da adega (dois MAX no índice (adega, versao))."""
+    produtos = Produto.objects.filter(adega=adega).aggregate(v=Max("versao"))["v"] or 0
+    removidos = ProdutoRemovido.objects.filter(adega=adega).aggregate(v=Max("versao"))["v"] or 0
+    return max(produtos, removidos)
+
+
+def _linhas(produtos):
+    return [
+        [pk, codigo, nome, f"{preco:.2f}"]
+        for pk, codigo, nome, preco in produtos.order_by().values_list(*CAMPOS)
+    ]
+
+
+def snapshot(adega):
+    # A versão é lida ANTES dos produtos: o que mudar no meio volta no próximo delta
+    versao = versao_atual(adega)
+    return {
+        "versao": versao,
+        "campos": CAMPOS,
+        "produtos": _linhas(Produto.objects.filter(adega=adega)),
+    }
+
+
+def mudancas(adega, desde):
+    versao = versao_atual(adega)
+    return {
+        "versao": versao,
+        "desde": desde,
+        "campos": CAMPOS,
+        "alterados": _linhas(Produto.objects.filter(adega=adega, versao__gt=desde)),
+        "removidos": list(
+            ProdutoRemovido.objects.filter(adega=adega, versao__gt=desde)
+            .values_list("produto_id", flat=True)
+        ),
+    }
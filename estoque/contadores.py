@@ -0,0 +1,35 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import EstoqueDelta, Produto
+
+
+def consolidar_deltas(lote=10000):
+    """
+    Soma os deltas pendentes em Produto.estoque_atual e apaga os somados,
+    na mesma transação (quem lê estoque_disponivel nunca vê o valor pela metade).
+    Retorna quantos deltas foram consolidados.
+    """
+    with transaction.atomic():
+        # skip_locked: dois consolidadores ao mesmo tempo não pegam o mesmo delta
+        deltas = list(
+            EstoqueDelta.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "produto_id", "quantidade")[:lote]
+        )
+        if not deltas:
+            return 0
+
+        por_produto = defaultdict(int)
+        for _, produto_id, quantidade in deltas:
+            por_produto[produto_id] += quantidade
+
+        for produto_id, total in por_produto.items():
+            if total:
+                Produto.objects.filter(pk=produto_id).update(estoque_atual=F("estoque_atual") + total)
+
+        EstoqueDelta.objects.filter(id__in=[d[0] for d in deltas]).delete()
+
+    return len(deltas)
@@ -0,0 +1,79 @@
+import csv
+from decimal import Decimal
+
+from django.conf import settings
+
+
+def _dinheiro(valor, casas=2):
+    return f"{valor:.{casas}f}".replace('.', ',')
+
+
+class _Eco:
+    """Pseudo-arquivo pro csv.writer: devolve a linha em vez de guardar."""
+
+    def write(self, valor):
+        return valor
+
+
+def _linhas_movimentacoes(movimentacoes, ao_progredir=None):
+    yield ['Data e Hora', 'Produto', 'Tipo', 'Quantidade', 'Preço Unit.', 'Valor Total']
+
+    # Cursor no servidor (Postgres): lê em lotes sem carregar tudo na memória
+    lote = settings.RELATORIO_CHUNK_SIZE
+    faturamento_total = Decimal("0.00")
+
+    for n, m in enumerate(movimentacoes.select_related("produto").iterator(chunk_size=lote), start=1):
+        valor_operacao = m.quantidade * m.produto.preco_venda
+        if m.tipo == 'SAIDA':
+            faturamento_total += valor_operacao
+
+        yield [
+            m.data.strftime('%d/%m/%Y %H:%M'),
+            m.produto.nome,
+            m.tipo,
+            m.quantidade,
+            _dinheiro(m.produto.preco_venda),
+            _dinheiro(valor_operacao)
+        ]
+
+        if ao_progredir and n % lote == 0:
+            ao_progredir(n)
+
+    yield []
+    yield ['', '', '', '', 'FATURAMENTO TOTAL:', f"R$ {_dinheiro(faturamento_total)}"]
+
+
+def escrever_csv_movimentacoes(saida, movimentacoes, ao_progredir=None):
+    """
+    Escreve o relatório de movimentações (CSV ';' com BOM pro Excel) no
+    arquivo `saida`. `ao_progredir(linhas)` é chamado a cada lote.
+    """
+    writer = csv.writer(saida, delimiter=';')
+    saida.write(u'\ufeff')
+    writer.writerows(_linhas_movimentacoes(movimentacoes, ao_progredir))
+
+
+def csv_movimentacoes_em_partes(movimentacoes):
+    """O mesmo CSV, linha a linha, pro StreamingHttpResponse (nunca inteiro na memória)."""
+    writer = csv.writer(_Eco(), delimiter=';')
+    yield u'\ufeff'
+    for linha in _linhas_movimentacoes(movimentacoes):
+        yield writer.writerow(linha)
+
+
+def escrever_csv_analise_abc(saida, linhas):
+    writer = csv.writer(saida, delimiter=';')
+    saida.write(u'\ufeff')
+
+    writer.writerow(['Classe', 'Produto', 'Categoria', 'Quantidade', 'Receita', 'Margem', '% Acumulado', 'Classe na Categoria'])
+    for l in linhas:
+        writer.writerow([
+            l["classe"],
+            l["produto__nome"],
+            l["produto__categoria__nome"],
+            l["quantidade_total"],
+            _dinheiro(l['receita']),
+            _dinheiro(l['margem']),
+            _dinheiro(l['participacao_acumulada'], 1),
+            l["classe_categoria"],
+        ])
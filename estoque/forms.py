@@ -94,4 +94,31 @@ class FiltroPeriodoVendasForm(forms.Form):
         if not self.data.get("data_inicio") and not self.data.get("data_fim"):
             hoje = timezone.localdate()
             self.initial["data_inicio"] = hoje - timedelta(days=7)
-            self.initial["data_fim"] = hoje
\ No newline at end of file
+            self.initial["data_fim"] = hoje
+
+
+class FiltroMovimentacoesForm(forms.Form):
+    tipo = forms.ChoiceField(
+        label="Tipo",
+        required=False,
+        choices=(("", "Todos"), ("ENTRADA", "Entrada"), ("SAIDA", "Saída"))
+    )
+    produto = forms.IntegerField(
+        required=False,
+        widget=forms.HiddenInput()
+    )
+    codigo_barras = forms.CharField(
+        label="Código de barras",
+        max_length=60,
+        required=False
+    )
+    data_inicio = forms.DateField(
+        label="Data inicial",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"})
+    )
+    data_fim = forms.DateField(
+        label="Data final",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"})
+    )
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from estoque.contadores import consolidar_deltas
+from estoque.models import Adega, Categoria, Movimentacao, Produto
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a venda concorrente de um mesmo produto: UPDATE na linha do "
+        "produto x deltas (ESTOQUE_DELTAS). Rode contra o Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendedores", type=int, default=32)
+        parser.add_argument("--vendas", type=int, default=100, help="Vendas por vendedor")
+
+    def handle(self, *args, **opts):
+        adega = Adega.objects.first() or Adega.objects.create(nome="Minha Adega")
+        categoria, _ = Categoria.objects.get_or_create(nome="Geral")
+
+        for modo in (False, True):
+            with override_settings(ESTOQUE_DELTAS=modo):
+                self._rodar(adega, categoria, modo, opts["vendedores"], opts["vendas"])
+
+    def _rodar(self, adega, categoria, modo, vendedores, vendas):
+        inicial = vendedores * vendas
+        produto = Produto.objects.create(
+            adega=adega,
+            nome="Benchmark estoque",
+            categoria=categoria,
+            preco_custo=1,
+            preco_venda=2,
+            estoque_atual=inicial,
+        )
+        connection.close()
+
+        erros = []
+        lock = threading.Lock()
+
+        def vendedor():
+            for _ in range(vendas):
+                try:
+                    Movimentacao.objects.create(adega=adega, produto=produto, tipo="SAIDA", quantidade=1)
+                except Exception as e:
+                    with lock:
+                        erros.append(repr(e))
+            connection.close()
+
+        threads = [threading.Thread(target=vendedor) for _ in range(vendedores)]
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        disponivel = Produto.objects.com_estoque().get(pk=produto.pk).estoque_disponivel
+        while consolidar_deltas():
+            pass
+        produto.refresh_from_db()
+
+        vendidas = inicial - len(erros)
+        nome = "deltas" if modo else "linha única"
+        self.stdout.write(
+            f"[{nome}] {vendedores} vendedores | {vendidas / duracao:.1f} vendas/s em {duracao:.2f}s | "
+            f"erros: {len(erros)}"
+        )
+        esperado = inicial - vendidas
+        ok = disponivel == esperado and produto.estoque_atual == esperado
+        self.stdout.write(
+            f"  estoque disponível antes de consolidar: {disponivel} | depois: {produto.estoque_atual} | "
+            f"esperado: {esperado} {'OK' if ok else 'DIVERGENTE'}"
+        )
+        if erros:
+            self.stdout.write(f"  primeiro erro: {erros[0]}")
+
+        produto.delete()
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.models import Adega, Categoria, Movimentacao, Produto
+from estoque.paginacao import codificar_cursor, pagina_keyset
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o custo da página 1 e de páginas profundas do histórico: "
+        "OFFSET x cursor (data, id). Use --popular para gerar movimentações de teste."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--popular", type=int, default=0, help="Cria N movimentações de teste antes")
+        parser.add_argument("--tamanho", type=int, default=50)
+        parser.add_argument("--repeticoes", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        adega = Adega.objects.first() or Adega.objects.create(nome="Minha Adega")
+        if opts["popular"]:
+            self._popular(adega, opts["popular"])
+
+        movs = Movimentacao.objects.filter(adega=adega).select_related("produto")
+        total = movs.count()
+        tamanho = opts["tamanho"]
+        if total < tamanho * 2:
+            self.stderr.write("Poucas movimentações; use --popular.")
+            return
+
+        self.stdout.write(f"{total} movimentações, páginas de {tamanho}")
+
+        for profundidade in (0, total // 2, total - tamanho):
+            # Cursor do item anterior à página (calculado fora da medição)
+            cursor = None
+            if profundidade:
+                data, pk = movs.order_by("-data", "-id").values_list("data", "id")[profundidade - 1]
+                cursor = codificar_cursor(data, pk)
+
+            offset = self._medir(
+                opts["repeticoes"],
+                lambda: list(movs.order_by("-data", "-id")[profundidade:profundidade + tamanho]),
+            )
+            keyset = self._medir(opts["repeticoes"], lambda: pagina_keyset(movs, cursor, tamanho))
+            self.stdout.write(
+                f"  página {profundidade // tamanho + 1:>8}: OFFSET {offset:8.2f}ms | cursor {keyset:8.2f}ms"
+            )
+
+    def _medir(self, repeticoes, consulta):
+        consulta()  # aquece cache
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            consulta()
+        return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+    def _popular(self, adega, quantidade):
+        categoria, _ = Categoria.objects.get_or_create(nome="Geral")
+        produtos = list(Produto.objects.filter(adega=adega)[:100]) or [
+            Produto.objects.create(adega=adega, nome="Benchmark", categoria=categoria, preco_custo=1, preco_venda=2)
+        ]
+
+        # bulk_create não passa pelo save(): não mexe no estoque
+        lote = 10000
+        for inicio in range(0, quantidade, lote):
+            Movimentacao.objects.bulk_create([
+                Movimentacao(
+                    adega=adega,
+                    produto=produtos[i % len(produtos)],
+                    tipo="SAIDA" if i % 3 else "ENTRADA",
+                    quantidade=1,
+                )
+                for i in range(inicio, min(inicio + lote, quantidade))
+            ])
+        self.stdout.write(f"{quantidade} movimentações criadas.")
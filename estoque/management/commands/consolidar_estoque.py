@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.contadores import consolidar_deltas
+
+
+class Command(BaseCommand):
+    help = "Soma os deltas de estoque pendentes (modo ESTOQUE_DELTAS) em Produto.estoque_atual."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=10000)
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=0,
+            help="Segundos entre rodadas; 0 roda uma vez e sai",
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            total = 0
+            while True:
+                feitos = consolidar_deltas(opts["lote"])
+                total += feitos
+                if feitos < opts["lote"]:
+                    break
+
+            if total:
+                self.stdout.write(f"{total} deltas consolidados.")
+
+            if not opts["intervalo"]:
+                return
+            time.sleep(opts["intervalo"])
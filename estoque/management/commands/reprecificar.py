@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.models import RegraPreco
+from estoque.precificacao import aplicar_regra, previsualizar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reprecifica os produtos pelas regras de preço ativas (todas as adegas). "
+        "Sem --aplicar só mostra a prévia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--aplicar", action="store_true", help="Grava os novos preços")
+        parser.add_argument("--regra", type=int, action="append", help="Só estas regras (id)")
+
+    def handle(self, *args, **opts):
+        regras = RegraPreco.objects.filter(ativa=True).select_related("adega", "categoria")
+        if opts["regra"]:
+            regras = regras.filter(pk__in=opts["regra"])
+
+        for regra in regras:
+            if not opts["aplicar"]:
+                total, amostra = previsualizar(regra, limite=5)
+                self.stdout.write(f"[prévia] {regra}: {total} produtos mudam")
+                for p in amostra:
+                    self.stdout.write(
+                        f"    {p['nome']}: custo {p['preco_custo']:.2f} | "
+                        f"{p['preco_venda']:.2f} -> {p['preco_novo']:.2f}"
+                    )
+                continue
+
+            inicio = time.perf_counter()
+            total = aplicar_regra(regra)
+            self.stdout.write(f"{regra}: {total} preços alterados em {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,64 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from estoque.tarefas import (
+    apagar_expirados, executar, pegar_proximo, reenfileirar_travados, registrar_worker, remover_worker,
+)
+
+# Segundos entre as limpezas dos relatórios expirados
+INTERVALO_LIMPEZA = 600
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de jobs (relatórios/exportações). Pode rodar vários, "
+        "em processos ou máquinas diferentes, contra o mesmo banco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, default=2, help="Segundos entre consultas com a fila vazia")
+        parser.add_argument("--uma-vez", action="store_true", help="Esvazia a fila e sai")
+
+    def handle(self, *args, **opts):
+        nome = f"{socket.gethostname()}:{os.getpid()}"
+        parar = []
+
+        # SIGTERM/CTRL+C: termina o job atual e sai (o próximo fica na fila)
+        def _parar(*_):
+            parar.append(True)
+
+        anteriores = {sig: signal.signal(sig, _parar) for sig in (signal.SIGTERM, signal.SIGINT)}
+
+        self.stdout.write(f"Worker {nome} rodando.")
+
+        proxima_limpeza = 0
+        try:
+            while not parar:
+                close_old_connections()
+                registrar_worker(nome)
+                reenfileirar_travados()
+
+                if time.monotonic() >= proxima_limpeza:
+                    apagar_expirados()
+                    proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+
+                job = pegar_proximo(nome)
+                if job is None:
+                    if opts["uma_vez"]:
+                        break
+                    time.sleep(opts["intervalo"])
+                    continue
+
+                self.stdout.write(f"{job} (tentativa {job.tentativas})")
+                executar(job)
+        finally:
+            remover_worker(nome)
+            for sig, anterior in anteriores.items():
+                signal.signal(sig, anterior)
+
+        self.stdout.write(f"Worker {nome} parado.")
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from estoque.models import Movimentacao, Produto
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga no banco: N clientes simultâneos fazendo a leitura de um "
+        "scan (busca por código de barras + última movimentação) e, a cada "
+        "--relatorio-a-cada requisições, o relatório de movimentações da adega "
+        "lido em streaming. Mostra vazão, latência e o pico de conexões abertas "
+        "no Postgres (pg_stat_activity)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=50)
+        parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por cliente")
+        parser.add_argument(
+            "--relatorio-a-cada", type=int, default=20,
+            help="Cada cliente roda o relatório a cada N requisições (0 desliga)",
+        )
+
+    def handle(self, *args, **opts):
+        clientes = opts["clientes"]
+        requisicoes = opts["requisicoes"]
+        relatorio_a_cada = opts["relatorio_a_cada"]
+        eh_postgres = connection.vendor == "postgresql"
+
+        codigos = list(
+            Produto.objects.exclude(codigo_barras__isnull=True)
+            .values_list("adega_id", "codigo_barras")[:500]
+        )
+        if not codigos:
+            self.stderr.write("Nenhum produto com código de barras para testar.")
+            return
+        connection.close()
+
+        latencias = []
+        erros = []
+        lock = threading.Lock()
+        parar = threading.Event()
+        pico_conexoes = [0]
+        relatorios = [0]
+
+        def cliente(n):
+            minhas = []
+            for i in range(requisicoes):
+                adega_id, codigo = codigos[(n * requisicoes + i) % len(codigos)]
+                inicio = time.perf_counter()
+                try:
+                    produto = Produto.objects.get(adega_id=adega_id, codigo_barras=codigo)
+                    Movimentacao.objects.filter(produto=produto).order_by("-data").first()
+                    if relatorio_a_cada and i % relatorio_a_cada == relatorio_a_cada - 1:
+                        # Mesmo caminho da exportação CSV: cursor no servidor, em lotes
+                        linhas = (
+                            Movimentacao.objects.filter(adega_id=adega_id)
+                            .select_related("produto")
+                            .order_by("-data")
+                            .iterator(chunk_size=settings.RELATORIO_CHUNK_SIZE)
+                        )
+                        for _ in linhas:
+                            pass
+                        with lock:
+                            relatorios[0] += 1
+                except Exception as e:
+                    with lock:
+                        erros.append(repr(e))
+                finally:
+                    # Fim da "requisição": devolve a conexão ao pool
+                    connection.close()
+                minhas.append(time.perf_counter() - inicio)
+            with lock:
+                latencias.extend(minhas)
+
+        def monitor():
+            with connections["default"].cursor() as cursor:
+                while not parar.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+                    )
+                    pico_conexoes[0] = max(pico_conexoes[0], cursor.fetchone()[0])
+                    time.sleep(0.1)
+            connections["default"].close()
+
+        vigia = threading.Thread(target=monitor) if eh_postgres else None
+        if vigia:
+            vigia.start()
+
+        threads = [threading.Thread(target=cliente, args=(n,)) for n in range(clientes)]
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        parar.set()
+        if vigia:
+            vigia.join()
+
+        latencias.sort()
+        total = len(latencias)
+        pool = settings.DATABASES["default"].get("OPTIONS", {}).get("pool")
+
+        self.stdout.write(f"Banco: {connection.vendor} | pool: {pool or 'desligado'}")
+        self.stdout.write(
+            f"Clientes: {clientes} | requisições: {total} (relatórios: {relatorios[0]}) | erros: {len(erros)}"
+        )
+        self.stdout.write(f"Vazão: {total / duracao:.1f} req/s em {duracao:.2f}s")
+        if total:
+            p95 = latencias[min(total - 1, int(total * 0.95))]
+            self.stdout.write(
+                f"Latência: p50 {statistics.median(latencias) * 1000:.1f}ms | p95 {p95 * 1000:.1f}ms"
+            )
+        if eh_postgres:
+            self.stdout.write(f"Pico de conexões no Postgres (inclui o monitor): {pico_conexoes[0]}")
+        if erros:
+            self.stdout.write(f"Primeiro erro: {erros[0]}")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstoqueDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.IntegerField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deltas_estoque', to='estoque.produto')),
+            ],
+            options={
+                'verbose_name': 'Delta de estoque',
+                'verbose_name_plural': 'Deltas de estoque',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0002_estoque_delta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegraPreco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('markup', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('final_centavos', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('ativa', models.BooleanField(default=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('adega', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='regras_preco', to='estoque.adega')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regras_preco', to='estoque.categoria')),
+            ],
+            options={
+                'verbose_name': 'Regra de preço',
+                'verbose_name_plural': 'Regras de preço',
+                'ordering': ['categoria__nome'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistoricoPreco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preco_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('preco_novo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('alterado_em', models.DateTimeField(auto_now_add=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_precos', to='estoque.produto')),
+                ('regra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='historico', to='estoque.regrapreco')),
+            ],
+            options={
+                'verbose_name': 'Histórico de preço',
+                'verbose_name_plural': 'Históricos de preço',
+                'ordering': ['-alterado_em'],
+            },
+        ),
+    ]
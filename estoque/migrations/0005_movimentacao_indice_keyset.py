@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['adega', '-data', '-id'], name='mov_adega_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['produto', '-data', '-id'], name='mov_produto_data_id_idx'),
+        ),
+    ]
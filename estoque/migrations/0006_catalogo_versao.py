@@ -0,0 +1,68 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def criar_sequencia(apps, schema_editor):
+    SequenciaCatalogo = apps.get_model("estoque", "SequenciaCatalogo")
+    SequenciaCatalogo.objects.get_or_create(pk=1, defaults={"valor": 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0005_movimentacao_indice_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoRemovido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('produto_id', models.BigIntegerField()),
+                ('codigo_barras', models.CharField(blank=True, max_length=60, null=True)),
+                ('versao', models.BigIntegerField()),
+                ('removido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Produto removido',
+                'verbose_name_plural': 'Produtos removidos',
+            },
+        ),
+        migrations.CreateModel(
+            name='SequenciaCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência do catálogo',
+                'verbose_name_plural': 'Sequência do catálogo',
+            },
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='versao',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['adega', 'versao'], name='produto_adega_versao_idx'),
+        ),
+        migrations.AddField(
+            model_name='produtoremovido',
+            name='adega',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='estoque.adega'),
+        ),
+        migrations.AddIndex(
+            model_name='produtoremovido',
+            index=models.Index(fields=['adega', 'versao'], name='removido_adega_versao_idx'),
+        ),
+        migrations.RunPython(criar_sequencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:35
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0006_catalogo_versao'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='regrapreco',
+            options={'ordering': ['categoria__nome', models.OrderBy(models.F('adega'), nulls_first=True)], 'verbose_name': 'Regra de preço', 'verbose_name_plural': 'Regras de preço'},
+        ),
+        migrations.AlterField(
+            model_name='regrapreco',
+            name='final_centavos',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(Decimal('0.99'))]),
+        ),
+        migrations.AlterField(
+            model_name='regrapreco',
+            name='markup',
+            field=models.DecimalField(decimal_places=2, max_digits=6, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
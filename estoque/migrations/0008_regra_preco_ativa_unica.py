@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+def desativar_repetidas(apps, schema_editor):
+    # Antes da constraint: fica ativa só a regra mais nova de cada categoria + escopo
+    RegraPreco = apps.get_model("estoque", "RegraPreco")
+    vistas = set()
+    for regra in RegraPreco.objects.filter(ativa=True).order_by("-id"):
+        escopo = (regra.categoria_id, regra.adega_id)
+        if escopo in vistas:
+            RegraPreco.objects.filter(pk=regra.pk).update(ativa=False)
+        vistas.add(escopo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0007_regra_preco_validadores'),
+    ]
+
+    operations = [
+        migrations.RunPython(desativar_repetidas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='regrapreco',
+            constraint=models.UniqueConstraint(condition=models.Q(('adega__isnull', False), ('ativa', True)), fields=('categoria', 'adega'), name='regra_ativa_unica_por_adega', violation_error_message='Já existe uma regra ativa para esta categoria nesta adega.'),
+        ),
+        migrations.AddConstraint(
+            model_name='regrapreco',
+            constraint=models.UniqueConstraint(condition=models.Q(('adega__isnull', True), ('ativa', True)), fields=('categoria',), name='regra_global_ativa_unica', violation_error_message='Já existe uma regra ativa para esta categoria em todas as adegas.'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.10 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0008_regra_preco_ativa_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Worker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('visto_em', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Worker',
+                'verbose_name_plural': 'Workers',
+            },
+        ),
+    ]
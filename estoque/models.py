@@ -1,4 +1,11 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 # =========================
@@ -33,9 +40,58 @@ class Categoria(models.Model):
         return self.nome
 
 
+# =========================
+# VERSÃO DO CATÁLOGO
+# =========================
+class SequenciaCatalogo(models.Model):
+    """Contador único de versões do catálogo (linha id=1, criada na migração)."""
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Sequência do catálogo"
+        verbose_name_plural = "Sequência do catálogo"
+
+
+def proxima_versao_catalogo():
+    """
+    Próxima versão do catálogo. Chamar dentro de transaction.atomic(): a
+    linha do contador fica travada até o commit, então as versões ficam
+    visíveis em ordem e o caixa que sincronizou até N nunca perde uma
+    versão menor que N.
+
+    Ordem de travas: SEMPRE o contador primeiro, depois as linhas de
+    produto (save, delete e reprecificação). Na ordem inversa dá deadlock.
+    """
+    # O UPDATE trava a linha até o fim da transação
+    if not SequenciaCatalogo.objects.filter(pk=1).update(valor=F("valor") + 1):
+        # Linha sumiu (flush, loaddata, teardown de teste): recria sem voltar atrás
+        maior = max(
+            Produto.objects.aggregate(v=models.Max("versao"))["v"] or 0,
+            ProdutoRemovido.objects.aggregate(v=models.Max("versao"))["v"] or 0,
+        )
+        SequenciaCatalogo.objects.get_or_create(pk=1, defaults={"valor": maior})
+        SequenciaCatalogo.objects.filter(pk=1).update(valor=F("valor") + 1)
+    return SequenciaCatalogo.objects.values_list("valor", flat=True).get(pk=1)
+
+
 # =========================
 # PRODUTO (por adega)
 # =========================
+class ProdutoQuerySet(models.QuerySet):
+    def com_estoque(self):
+        """Anota estoque_disponivel = estoque_atual + deltas ainda não consolidados."""
+        pendentes = (
+            EstoqueDelta.objects.filter(produto=OuterRef("pk"))
+            .order_by()
+            .values("produto")
+            .annotate(total=Sum("quantidade"))
+            .values("total")
+        )
+        return self.annotate(
+            estoque_disponivel=F("estoque_atual") + Coalesce(Subquery(pendentes), Value(0))
+        )
+
+
 class Produto(models.Model):
     adega = models.ForeignKey(
         Adega,
@@ -63,6 +119,12 @@ class Produto(models.Model):
     estoque_atual = models.IntegerField(default=0)
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    # 🔹 Sync do catálogo nos caixas: muda a cada alteração do produto
+    versao = models.BigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    objects = ProdutoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
@@ -76,6 +138,19 @@ class Produto(models.Model):
             )
         ]
 
+        # 🔹 "O que mudou desde a versão N" no catálogo
+        indexes = [
+            models.Index(fields=["adega", "versao"], name="produto_adega_versao_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Contador antes da linha do produto (ver proxima_versao_catalogo)
+            self.versao = proxima_versao_catalogo()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "versao", "atualizado_em"}
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nome} ({self.adega.nome})"
 
@@ -111,20 +186,249 @@ class Movimentacao(models.Model):
         verbose_name_plural = "Movimentações"
         ordering = ["-data"]
 
+        # 🔹 Paginação por cursor (data, id) no histórico
+        indexes = [
+            models.Index(fields=["adega", "-data", "-id"], name="mov_adega_data_id_idx"),
+            models.Index(fields=["produto", "-data", "-id"], name="mov_produto_data_id_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # 🔥 Regra de negócio do estoque
-        if not self.pk:
-            if self.tipo == "ENTRADA":
-                self.produto.estoque_atual += self.quantidade
-            elif self.tipo == "SAIDA":
-                self.produto.estoque_atual -= self.quantidade
+        if self.pk:
+            return super().save(*args, **kwargs)
 
-            self.produto.save()
+        delta = self.quantidade if self.tipo == "ENTRADA" else -self.quantidade
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if settings.ESTOQUE_DELTAS:
+                # Produto muito vendido: só insere, sem travar a linha do produto
+                EstoqueDelta.objects.create(produto=self.produto, quantidade=delta)
+            else:
+                # UPDATE só da coluna do estoque (não regrava o produto inteiro)
+                Produto.objects.filter(pk=self.produto_id).update(
+                    estoque_atual=F("estoque_atual") + delta
+                )
+                self.produto.estoque_atual += delta
+
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.tipo} - {self.produto.nome} ({self.adega.nome})"
 
 
+# =========================
+# DELTAS DE ESTOQUE (modo ESTOQUE_DELTAS)
+# =========================
+class EstoqueDelta(models.Model):
+    """
+    Variação de estoque ainda não somada em Produto.estoque_atual.
+    Só recebe INSERT; o comando consolidar_estoque soma e apaga.
+    """
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name="deltas_estoque"
+    )
+    quantidade = models.IntegerField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Delta de estoque"
+        verbose_name_plural = "Deltas de estoque"
+
+    def __str__(self):
+        return f"{self.produto.nome}: {self.quantidade:+d}"
+
+
+# =========================
+# REGRA DE PREÇO (reprecificação em massa)
+# =========================
+class RegraPreco(models.Model):
+    # Vazio = vale para todas as adegas
+    adega = models.ForeignKey(
+        Adega,
+        on_delete=models.CASCADE,
+        related_name="regras_preco",
+        blank=True,
+        null=True
+    )
+
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        related_name="regras_preco"
+    )
+
+    # 🔹 Markup em % sobre o preço de custo (35 = custo + 35%)
+    # (nunca negativo: a regra não pode vender abaixo do custo)
+    markup = models.DecimalField(max_digits=6, decimal_places=2, validators=[MinValueValidator(0)])
+
+    # 🔹 Final do preço (0.90 = arredonda pra cima até X,90). Vazio = só centavos
+    final_centavos = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(0), MaxValueValidator(Decimal("0.99"))],
+    )
+
+    ativa = models.BooleanField(default=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Regra de preço"
+        verbose_name_plural = "Regras de preço"
+        # Globais (adega vazia) primeiro; a regra da adega sempre tem a palavra final
+        ordering = ["categoria__nome", F("adega").asc(nulls_first=True)]
+        # Uma regra ativa por categoria e escopo (a global tem adega NULL, que
+        # não conta como repetida no UNIQUE: por isso a segunda constraint)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["categoria", "adega"],
+                condition=Q(ativa=True, adega__isnull=False),
+                name="regra_ativa_unica_por_adega",
+                violation_error_message="Já existe uma regra ativa para esta categoria nesta adega.",
+            ),
+            models.UniqueConstraint(
+                fields=["categoria"],
+                condition=Q(ativa=True, adega__isnull=True),
+                name="regra_global_ativa_unica",
+                violation_error_message="Já existe uma regra ativa para esta categoria em todas as adegas.",
+            ),
+        ]
+
+    def __str__(self):
+        onde = self.adega.nome if self.adega_id else "todas as adegas"
+        final = f", final {self.final_centavos}" if self.final_centavos is not None else ""
+        return f"{self.categoria.nome}: custo + {self.markup}%{final} ({onde})"
+
+
+# =========================
+# HISTÓRICO DE PREÇO
+# =========================
+class HistoricoPreco(models.Model):
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name="historico_precos"
+    )
+
+    regra = models.ForeignKey(
+        RegraPreco,
+        on_delete=models.SET_NULL,
+        related_name="historico",
+        blank=True,
+        null=True
+    )
+
+    preco_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    preco_novo = models.DecimalField(max_digits=10, decimal_places=2)
+    alterado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Histórico de preço"
+        verbose_name_plural = "Históricos de preço"
+        ordering = ["-alterado_em"]
+
+    def __str__(self):
+        return f"{self.produto.nome}: {self.preco_anterior} → {self.preco_novo}"
+
+
+# =========================
+# JOB (fila de relatórios em segundo plano)
+# =========================
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ("PENDENTE", "Pendente"),
+        ("RODANDO", "Rodando"),
+        ("CONCLUIDO", "Concluído"),
+        ("ERRO", "Erro"),
+    )
+
+    adega = models.ForeignKey(
+        Adega,
+        on_delete=models.CASCADE,
+        related_name="jobs"
+    )
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="jobs",
+        blank=True,
+        null=True
+    )
 
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDENTE")
+
+    # 🔹 0 a 100
+    progresso = models.PositiveSmallIntegerField(default=0)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+
+    # 🔹 Só é pego pelo worker depois desse horário (usado no retry)
+    executar_apos = models.DateTimeField(default=timezone.now)
+
+    # 🔹 Worker que está rodando e último sinal de vida dele
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat = models.DateTimeField(blank=True, null=True)
+
+    # 🔹 Caminho do arquivo gerado, relativo a settings.JOBS_DIR
+    arquivo = models.CharField(max_length=255, blank=True)
+    erro = models.TextField(blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ["-criado_em"]
+        indexes = [
+            models.Index(fields=["status", "executar_apos"], name="job_fila_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.status})"
+
+
+class Worker(models.Model):
+    """Sinal de vida de cada "manage.py run_worker" (sem worker o relatório sai na hora)."""
+    nome = models.CharField(max_length=100, unique=True)
+    visto_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Worker"
+        verbose_name_plural = "Workers"
+
+    def __str__(self):
+        return self.nome
+
+
+# =========================
+# PRODUTO REMOVIDO (tombstone do catálogo)
+# =========================
+class ProdutoRemovido(models.Model):
+    # Sem FK de verdade: o registro fica mesmo se a adega for apagada
+    adega = models.ForeignKey(
+        Adega,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+"
+    )
+    produto_id = models.BigIntegerField()
+    codigo_barras = models.CharField(max_length=60, blank=True, null=True)
+    versao = models.BigIntegerField()
+    removido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Produto removido"
+        verbose_name_plural = "Produtos removidos"
+        indexes = [
+            models.Index(fields=["adega", "versao"], name="removido_adega_versao_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.produto_id} ({self.codigo_barras}) v{self.versao}"
@@ -0,0 +1,47 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+TAMANHO_PADRAO = 50
+TAMANHO_MAXIMO = 200
+
+
+def codificar_cursor(data, pk):
+    bruto = f"{data.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """(data, id) do cursor, ou None se vier vazio/inválido (volta pra página 1)."""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        data, pk = bruto.split("|")
+        return datetime.fromisoformat(data), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def pagina_keyset(queryset, cursor=None, tamanho=TAMANHO_PADRAO):
+    """
+    Página de `queryset` em ordem (-data, -id) começando depois do cursor.
+    Sem OFFSET: a página N custa o mesmo que a página 1, desde que exista
+    índice em (..., data, id). Retorna (itens, próximo cursor ou None).
+    """
+    queryset = queryset.order_by("-data", "-id")
+
+    posicao = decodificar_cursor(cursor)
+    if posicao:
+        data, pk = posicao
+        # (data, id) < (cursor): data <= X limita a faixa do índice
+        queryset = queryset.filter(data__lte=data).exclude(Q(data=data) & Q(id__gte=pk))
+
+    itens = list(queryset[:tamanho + 1])
+    if len(itens) <= tamanho:
+        return itens, None
+
+    itens = itens[:tamanho]
+    ultimo = itens[-1]
+    return itens, codificar_cursor(ultimo.data, ultimo.pk)
@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Ceil, Round
+from django.utils import timezone
+
+from .models import HistoricoPreco, Produto, RegraPreco, proxima_versao_catalogo
+
+PRECO = DecimalField(max_digits=10, decimal_places=2)
+
+# Produtos por transação do aplicar_regra (histórico + UPDATE)
+LOTE_PRODUTOS = 1000
+
+
+def preco_da_regra(regra):
+    """Expressão SQL do novo preço de venda: custo + markup, com o final da regra."""
+    fator = Value(1 + regra.markup / Decimal("100"), output_field=PRECO)
+    bruto = ExpressionWrapper(F("preco_custo") * fator, output_field=PRECO)
+
+    if regra.final_centavos is None:
+        return Round(bruto, 2, output_field=PRECO)
+
+    # Sobe até o próximo X,final: 10,50 -> 10,90 ; 10,95 -> 11,90
+    final = Value(regra.final_centavos, output_field=PRECO)
+    return ExpressionWrapper(Ceil(bruto - final) + final, output_field=PRECO)
+
+
+def produtos_da_regra(regra):
+    """
+    Produtos que a regra reprecifica. A regra de uma adega vence a regra
+    global da mesma categoria: a global pula as adegas que têm regra própria ativa.
+    """
+    produtos = Produto.objects.filter(categoria_id=regra.categoria_id)
+    if regra.adega_id:
+        return produtos.filter(adega_id=regra.adega_id)
+
+    com_regra_propria = RegraPreco.objects.filter(
+        categoria_id=regra.categoria_id,
+        ativa=True,
+        adega__isnull=False,
+    ).values("adega_id")
+    return produtos.exclude(adega_id__in=com_regra_propria)
+
+
+def _alterados(regra):
+    """Produtos da regra cujo preço atual é diferente do preço calculado."""
+    return (
+        produtos_da_regra(regra)
+        .exclude(preco_venda=preco_da_regra(regra))
+    )
+
+
+def previsualizar(regra, limite=20):
+    """(quantidade de produtos que mudam, amostra com preço atual e novo)."""
+    alterados = _alterados(regra).annotate(preco_novo=preco_da_regra(regra))
+    amostra = list(alterados.values("nome", "preco_custo", "preco_venda", "preco_novo")[:limite])
+    return alterados.count(), amostra
+
+
+def aplicar_regra(regra):
+    """
+    Grava o histórico (bulk_create) e troca o preço com um UPDATE set-based,
+    em lotes de LOTE_PRODUTOS, cada lote na sua própria transação curta.
+
+    O contador do catálogo é global (trava todo save de produto de todas as
+    adegas), então fica preso só durante um lote, não durante a regra
+    inteira. Se cair no meio, os lotes já gravados ficam; rodar de novo
+    aplica o resto (_alterados pula quem já está no preço da regra).
+    Retorna quantos produtos mudaram.
+    """
+    novo_preco = preco_da_regra(regra)
+    total = 0
+    ultimo = 0
+    while True:
+        # Ids do próximo lote sem trava nenhuma: se não sobrou nada, nem pega o contador
+        ids = list(
+            _alterados(regra)
+            .filter(pk__gt=ultimo)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:LOTE_PRODUTOS]
+        )
+        if not ids:
+            return total
+        ultimo = ids[-1]
+
+        with transaction.atomic():
+            # Contador do catálogo ANTES das linhas de produto (mesma ordem do
+            # Produto.save); todos os produtos do lote ganham esta versão
+            versao = proxima_versao_catalogo()
+
+            # Trava as linhas do lote até o UPDATE; quem mudou nesse meio-tempo
+            # e já não difere da regra sai do lote
+            mudancas = list(
+                _alterados(regra)
+                .filter(pk__in=ids)
+                .order_by("pk")
+                .select_for_update()
+                .annotate(preco_novo=novo_preco)
+                .values_list("id", "preco_venda", "preco_novo")
+            )
+            if not mudancas:
+                continue
+
+            HistoricoPreco.objects.bulk_create([
+                HistoricoPreco(
+                    produto_id=produto_id,
+                    regra_id=regra.pk,
+                    preco_anterior=anterior,
+                    preco_novo=novo,
+                )
+                for produto_id, anterior, novo in mudancas
+            ])
+            Produto.objects.filter(pk__in=[produto_id for produto_id, _, _ in mudancas]).update(
+                preco_venda=novo_preco,
+                versao=versao,
+                atualizado_em=timezone.now(),
+            )
+        total += len(mudancas)
@@ -0,0 +1,100 @@
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA = "replica"
+
+logger = logging.getLogger(__name__)
+
+# Ligado só durante as views de relatório marcadas com @ler_da_replica
+_usar_replica = ContextVar("usar_replica", default=False)
+
+# Cache do atraso da réplica por processo: (verificado_em, atraso_em_segundos)
+_ATRASO_TTL = 5
+_atraso_cache = [0.0, None]
+
+
+def _medir_atraso():
+    """Atraso da réplica em segundos (None se não deu pra medir)."""
+    conexao = connections[REPLICA]
+    if conexao.vendor != "postgresql":
+        # Espelho SQLite local: não há replicação pra medir
+        return 0.0
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END
+                """
+            )
+            return float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning("Erro ao medir atraso da réplica: %s", e)
+        return None
+
+
+def replica_disponivel():
+    if REPLICA not in settings.DATABASES:
+        return False
+
+    agora = time.monotonic()
+    if agora - _atraso_cache[0] > _ATRASO_TTL:
+        _atraso_cache[0] = agora
+        _atraso_cache[1] = _medir_atraso()
+
+    atraso = _atraso_cache[1]
+    return atraso is not None and atraso <= settings.REPLICA_MAX_LAG
+
+
+def fixar_primario(request):
+    """Read-your-writes: depois de gravar, o usuário lê do default por um tempo."""
+    request.session["ler_primario_ate"] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+
+def ler_da_replica(view):
+    """Decorator para views só de leitura (relatórios e exportações)."""
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if request.session.get("ler_primario_ate", 0) > time.time() or not replica_disponivel():
+            return view(request, *args, **kwargs)
+
+        token = _usar_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _usar_replica.reset(token)
+
+    return _view
+
+
+class ReplicaRouter:
+    """
+    Manda as leituras do app estoque para a réplica enquanto uma view
+    @ler_da_replica está rodando. Sessão e usuário continuam no default.
+    Gravações sempre vão para o default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _usar_replica.get() and model._meta.app_label == "estoque":
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mesmos dados nos dois bancos
+        if {obj1._state.db, obj2._state.db} <= {"default", REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -1,9 +1,9 @@
 import os
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
-from .models import Adega
+from .models import Adega, Produto, ProdutoRemovido, proxima_versao_catalogo
 
 
 @receiver(post_migrate)
@@ -30,3 +30,21 @@ def criar_dados_iniciais(sender, **kwargs):
             email=email,
             password=password
         )
+
+
+@receiver(pre_delete, sender=Produto)
+def reservar_versao_remocao(sender, instance, **kwargs):
+    # pre_delete já roda na transação do delete: pega o contador ANTES de
+    # travar a linha do produto (mesma ordem do save e da reprecificação)
+    instance._versao_remocao = proxima_versao_catalogo()
+
+
+@receiver(post_delete, sender=Produto)
+def registrar_produto_removido(sender, instance, **kwargs):
+    # tombstone: os caixas apagam o produto no próximo sync do catálogo
+    ProdutoRemovido.objects.create(
+        adega_id=instance.adega_id,
+        produto_id=instance.pk,
+        codigo_barras=instance.codigo_barras,
+        versao=instance._versao_remocao,
+    )
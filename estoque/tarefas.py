@@ -0,0 +1,182 @@
+import os
+import threading
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .analise import curva_abc
+from .exportacao import escrever_csv_analise_abc, escrever_csv_movimentacoes
+from .models import Job, Movimentacao, Worker
+
+
+def _desta_tentativa(job):
+    """
+    O job só enquanto ainda é desta execução. Se ele foi reenfileirado e outro
+    worker pegou, as atualizações da execução antiga não pegam em nada.
+    """
+    return Job.objects.filter(pk=job.pk, status="RODANDO", worker=job.worker, tentativas=job.tentativas)
+
+
+# --- TAREFAS ---
+def _atualizar_progresso(job, progresso):
+    _desta_tentativa(job).update(progresso=progresso, heartbeat=timezone.now())
+
+
+def relatorio_movimentacoes(job, arquivo):
+    movimentacoes = Movimentacao.objects.filter(adega=job.adega).order_by("-data")
+    total = movimentacoes.count() or 1
+
+    escrever_csv_movimentacoes(
+        arquivo,
+        movimentacoes,
+        ao_progredir=lambda linhas: _atualizar_progresso(job, min(99, linhas * 100 // total)),
+    )
+
+
+def analise_abc(job, arquivo):
+    inicio = date.fromisoformat(job.parametros["data_inicio"])
+    fim = date.fromisoformat(job.parametros["data_fim"])
+    escrever_csv_analise_abc(arquivo, curva_abc(job.adega, inicio, fim))
+
+
+# tipo -> (função, nome do arquivo baixado)
+TAREFAS = {
+    "relatorio_movimentacoes": (relatorio_movimentacoes, "relatorio_adega"),
+    "analise_abc": (analise_abc, "curva_abc"),
+}
+
+
+# --- FILA ---
+def enfileirar(tipo, adega, usuario=None, **parametros):
+    if tipo not in TAREFAS:
+        raise ValueError(f"Tarefa desconhecida: {tipo}")
+    return Job.objects.create(tipo=tipo, adega=adega, usuario=usuario, parametros=parametros)
+
+
+def pegar_proximo(worker):
+    """
+    Reserva o próximo job pendente. SKIP LOCKED deixa vários workers
+    (em processos diferentes) pegarem jobs distintos sem esperar um ao outro.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDENTE", executar_apos__lte=agora)
+            .order_by("executar_apos", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = "RODANDO"
+        job.worker = worker
+        job.heartbeat = agora
+        job.tentativas += 1
+        job.save(update_fields=["status", "worker", "heartbeat", "tentativas"])
+    return job
+
+
+def _falhou(job, erro):
+    # Se outro worker já reenfileirou (ou já está rodando de novo), não mexe
+    rodando = _desta_tentativa(job)
+    if job.tentativas < job.max_tentativas:
+        # Retry com espera crescente: 30s, 60s, 120s...
+        espera = timedelta(seconds=30 * 2 ** (job.tentativas - 1))
+        rodando.update(
+            status="PENDENTE", executar_apos=timezone.now() + espera, erro=erro, worker=""
+        )
+    else:
+        rodando.update(status="ERRO", erro=erro, concluido_em=timezone.now())
+
+
+def _manter_vivo(job, parar):
+    """Heartbeat enquanto a tarefa roda (a curva ABC é uma query só, sem progresso)."""
+    intervalo = max(1, min(settings.JOB_TIMEOUT_SEGUNDOS, settings.WORKER_VIVO_SEGUNDOS) // 3)
+    try:
+        while not parar.wait(intervalo):
+            _desta_tentativa(job).update(heartbeat=timezone.now())
+            registrar_worker(job.worker)
+    finally:
+        connection.close()
+
+
+def executar(job):
+    funcao, _ = TAREFAS[job.tipo]
+    settings.JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    # Um arquivo por tentativa: uma execução antiga que ainda esteja rodando
+    # nunca escreve por cima da nova
+    nome = f"{job.tipo}_{job.pk}_{job.tentativas}.csv"
+    destino = settings.JOBS_DIR / nome
+    temporario = settings.JOBS_DIR / f".{nome}.tmp"
+
+    parar = threading.Event()
+    vigia = threading.Thread(target=_manter_vivo, args=(job, parar), daemon=True)
+    vigia.start()
+    try:
+        with open(temporario, "w", encoding="utf-8", newline="") as arquivo:
+            funcao(job, arquivo)
+        # Só aparece com o nome final depois de escrito inteiro
+        os.replace(temporario, destino)
+    except Exception:
+        temporario.unlink(missing_ok=True)
+        _falhou(job, traceback.format_exc())
+        return
+    finally:
+        parar.set()
+        vigia.join()
+
+    concluido = _desta_tentativa(job).update(
+        status="CONCLUIDO", progresso=100, arquivo=nome, erro="", concluido_em=timezone.now()
+    )
+    if not concluido:
+        # O job foi reenfileirado no meio: vale o resultado da outra tentativa
+        destino.unlink(missing_ok=True)
+
+
+def reenfileirar_travados():
+    """Jobs RODANDO de um worker que morreu (sem heartbeat) voltam pra fila."""
+    limite = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT_SEGUNDOS)
+    travados = Job.objects.filter(status="RODANDO", heartbeat__lt=limite)
+    for job in travados:
+        _falhou(job, f"Worker {job.worker} parou de responder.")
+
+
+def apagar_expirados():
+    """
+    Apaga do disco os relatórios prontos há mais de JOBS_RETENCAO_HORAS (o
+    job fica, sem arquivo) e os .tmp largados por worker que morreu no meio.
+    """
+    limite = timezone.now() - timedelta(hours=settings.JOBS_RETENCAO_HORAS)
+    expirados = list(
+        Job.objects.filter(status="CONCLUIDO", concluido_em__lt=limite)
+        .exclude(arquivo="")
+        .values_list("pk", "arquivo")
+    )
+    for _, arquivo in expirados:
+        (settings.JOBS_DIR / arquivo).unlink(missing_ok=True)
+    Job.objects.filter(pk__in=[pk for pk, _ in expirados]).update(arquivo="")
+
+    if settings.JOBS_DIR.exists():
+        for temporario in settings.JOBS_DIR.glob(".*.tmp"):
+            if temporario.stat().st_mtime < limite.timestamp():
+                temporario.unlink(missing_ok=True)
+    return len(expirados)
+
+
+# --- WORKERS ---
+def registrar_worker(nome):
+    Worker.objects.update_or_create(nome=nome, defaults={"visto_em": timezone.now()})
+
+
+def remover_worker(nome):
+    Worker.objects.filter(nome=nome).delete()
+
+
+def worker_ativo():
+    """Algum run_worker deu sinal de vida há pouco? (senão o relatório sai na hora)"""
+    limite = timezone.now() - timedelta(seconds=settings.WORKER_VIVO_SEGUNDOS)
+    return Worker.objects.filter(visto_em__gte=limite).exists()
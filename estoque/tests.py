@@ -1,3 +1,633 @@
-from django.test import TestCase
+import copy
+import tempfile
+import warnings
+from collections import deque
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import routers
+from .admin import ProdutoAdmin
+from .analise import curva_abc_queryset
+from .contadores import consolidar_deltas
+from .models import (
+    Adega, Categoria, EstoqueDelta, HistoricoPreco, Job, Movimentacao, Produto, RegraPreco, SequenciaCatalogo,
+    Worker,
+)
+from .paginacao import TAMANHO_PADRAO, pagina_keyset
+from .precificacao import aplicar_regra, preco_da_regra, produtos_da_regra
+from .routers import REPLICA
+from .tarefas import (
+    _falhou, apagar_expirados, enfileirar, executar, pegar_proximo, reenfileirar_travados, registrar_worker,
+)
+
+
+def _produto(adega, categoria, **campos):
+    dados = {"nome": "Vinho", "preco_custo": Decimal("10.00"), "preco_venda": Decimal("20.00")}
+    dados.update(campos)
+    return Produto.objects.create(adega=adega, categoria=categoria, **dados)
+
+
+def _usuario(nome="caixa", **campos):
+    return get_user_model().objects.create_user(nome, password="x", **campos)
+
+
+# =========================
+# EXPORTAÇÃO (CSV em streaming)
+# =========================
+class BaixarRelatorioTests(TestCase):
+    def test_csv_sai_em_partes_com_o_total(self):
+        adega = Adega.objects.first()
+        produto = _produto(adega, Categoria.objects.create(nome="Tintos"))
+        Movimentacao.objects.bulk_create([
+            Movimentacao(adega=adega, produto=produto, tipo="SAIDA", quantidade=2) for _ in range(3)
+        ])
+        self.client.force_login(_usuario())
+
+        resposta = self.client.get(reverse("baixar_relatorio"))
+
+        self.assertTrue(resposta.streaming)
+        linhas = b"".join(resposta.streaming_content).decode().splitlines()
+        self.assertEqual(len(linhas), 1 + 3 + 2)  # cabeçalho, movimentações, linha vazia e total
+        self.assertTrue(linhas[-1].endswith("R$ 120,00"))
+
+
+# =========================
+# RÉPLICA DE LEITURA
+# =========================
+@contextmanager
+def _replica_espelho():
+    """
+    Alias "replica" sobre a mesma conexão do default (enxerga os dados da
+    transação do teste), com log de queries próprio pra saber quem leu de onde.
+    """
+    replica = copy.copy(connections["default"])
+    replica.alias = REPLICA
+    replica.queries_log = deque(maxlen=replica.queries_log.maxlen)
+    bancos = {**settings.DATABASES, REPLICA: settings.DATABASES["default"]}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # "Overriding setting DATABASES..."
+        with override_settings(DATABASES=bancos):
+            connections[REPLICA] = replica
+            try:
+                yield replica
+            finally:
+                del connections[REPLICA]
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        routers._atraso_cache[:] = [0.0, None]
+        adega = Adega.objects.first()
+        self.produto = _produto(adega, Categoria.objects.create(nome="Tintos"), codigo_barras="789", estoque_atual=10)
+        self.client.force_login(_usuario())
+
+    def _leituras_na_replica(self, url):
+        with _replica_espelho() as replica, CaptureQueriesContext(replica) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [q["sql"] for q in queries if "estoque_" in q["sql"]]
+
+    def test_relatorio_le_da_replica(self):
+        self.assertTrue(self._leituras_na_replica(reverse("relatorios")))
+        self.assertTrue(self._leituras_na_replica(reverse("api_movimentacoes")))
+
+    def test_depois_de_vender_le_do_primario(self):
+        with _replica_espelho():
+            resposta = self.client.post(
+                reverse("saida_codigo"), {"codigo_barras": "789", "quantidade": "1", "acao": "salvar"}
+            )
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(self._leituras_na_replica(reverse("relatorios")), [])
+
+    def test_replica_atrasada_ou_fora_le_do_primario(self):
+        for atraso in (None, settings.REPLICA_MAX_LAG + 1):
+            routers._atraso_cache[:] = [0.0, None]
+            with patch("estoque.routers._medir_atraso", return_value=atraso):
+                self.assertEqual(self._leituras_na_replica(reverse("relatorios")), [], atraso)
+
+    def test_sem_replica_configurada_le_do_primario(self):
+        self.assertNotIn(REPLICA, settings.DATABASES)
+        with CaptureQueriesContext(connections["default"]) as queries:
+            self.client.get(reverse("relatorios"))
+        self.assertTrue(any("estoque_movimentacao" in q["sql"] for q in queries))
+
+
+# =========================
+# CURVA ABC
+# =========================
+class CurvaAbcTests(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        self.hoje = timezone.localdate()
+        self.tintos = Categoria.objects.create(nome="Tintos")
+        self.brancos = Categoria.objects.create(nome="Brancos")
+
+    def _vender(self, nome, categoria, preco):
+        produto = _produto(self.adega, categoria, nome=nome, preco_custo=Decimal("0"), preco_venda=Decimal(preco))
+        Movimentacao.objects.bulk_create([
+            Movimentacao(adega=self.adega, produto=produto, tipo="SAIDA", quantidade=1),
+            Movimentacao(adega=self.adega, produto=produto, tipo="ENTRADA", quantidade=5),
+        ])
+
+    def test_classes_nos_cortes_de_80_e_95_numa_query(self):
+        # Receita 50 / 30 / 15 / 5 = 100: acumulado antes de cada um 0, 50, 80, 95
+        self._vender("P50", self.tintos, "50")
+        self._vender("P30", self.brancos, "30")
+        self._vender("P15", self.tintos, "15")
+        self._vender("P5", self.brancos, "5")
+
+        with self.assertNumQueries(1):
+            linhas = list(curva_abc_queryset(self.adega, self.hoje, self.hoje))
+
+        resultado = {
+            l["produto__nome"]: (l["classe"], l["classe_categoria"], round(l["participacao_acumulada"]))
+            for l in linhas
+        }
+        self.assertEqual(resultado, {
+            "P50": ("A", "A", 50),
+            "P30": ("A", "A", 80),
+            "P15": ("B", "A", 95),  # Tintos: 50 de 65 antes -> ainda A
+            "P5": ("C", "B", 100),  # Brancos: 30 de 35 antes -> B
+        })
+        self.assertEqual([l["quantidade_total"] for l in linhas], [1, 1, 1, 1])
+
+    def test_receita_zero_nao_quebra(self):
+        self._vender("Brinde", self.tintos, "0")
+        self.client.force_login(_usuario(is_staff=True))
+
+        linhas = list(curva_abc_queryset(self.adega, self.hoje, self.hoje))
+        self.assertEqual((linhas[0]["participacao_acumulada"], linhas[0]["classe"]), (0.0, "C"))
+
+        self.assertEqual(self.client.get(reverse("analise_abc")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("baixar_analise_abc")).status_code, 200)
+
+
+# =========================
+# ESTOQUE POR DELTAS
+# =========================
+class EstoqueDeltasTests(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        self.produto = _produto(self.adega, Categoria.objects.create(nome="Tintos"), codigo_barras="789", estoque_atual=10)
+
+    def _disponivel(self):
+        return Produto.objects.com_estoque().get(pk=self.produto.pk).estoque_disponivel
+
+    def _vender(self, quantidade=1):
+        Movimentacao.objects.create(adega=self.adega, produto=self.produto, tipo="SAIDA", quantidade=quantidade)
+
+    def test_com_estoque_soma_os_deltas_pendentes(self):
+        self.assertEqual(self._disponivel(), 10)
+        EstoqueDelta.objects.create(produto=self.produto, quantidade=-3)
+        EstoqueDelta.objects.create(produto=self.produto, quantidade=1)
+        self.assertEqual(self._disponivel(), 8)
+
+    @override_settings(ESTOQUE_DELTAS=True)
+    def test_venda_grava_delta_sem_tocar_no_produto(self):
+        self._vender(2)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 10)
+        self.assertEqual(list(EstoqueDelta.objects.values_list("quantidade", flat=True)), [-2])
+        self.assertEqual(self._disponivel(), 8)
+
+    @override_settings(ESTOQUE_DELTAS=False)
+    def test_venda_sem_deltas_atualiza_a_linha(self):
+        self._vender(2)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 8)
+        self.assertFalse(EstoqueDelta.objects.exists())
+
+    @override_settings(ESTOQUE_DELTAS=True)
+    def test_consolidar_soma_e_apaga_os_deltas(self):
+        for _ in range(3):
+            self._vender()
+        self.assertEqual(consolidar_deltas(), 3)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 7)
+        self.assertFalse(EstoqueDelta.objects.exists())
+        self.assertEqual(self._disponivel(), 7)
+        self.assertEqual(consolidar_deltas(), 0)
+
+    @override_settings(ESTOQUE_DELTAS=True)
+    def test_venda_confere_o_estoque_com_deltas(self):
+        self._vender(10)  # estoque_atual ainda 10, disponível 0
+        self.client.force_login(_usuario())
+
+        self.client.post(reverse("saida_codigo"), {"codigo_barras": "789", "quantidade": "1", "acao": "salvar"})
+
+        self.assertEqual(Movimentacao.objects.filter(produto=self.produto).count(), 1)
+        self.assertEqual(self._disponivel(), 0)
+
+
+@override_settings(ESTOQUE_DELTAS=True)
+class ProdutoAdminDeltasTests(TestCase):
+    def setUp(self):
+        self.produto = _produto(Adega.objects.first(), Categoria.objects.create(nome="Tintos"), estoque_atual=10)
+        EstoqueDelta.objects.create(produto=self.produto, quantidade=-4)
+        self.admin = _usuario("gerente", is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+
+    def test_lista_mostra_disponivel_sem_editar_estoque(self):
+        resposta = self.client.get(reverse("admin:estoque_produto_changelist"))
+        self.assertContains(resposta, 'name="form-0-preco_venda"')
+        self.assertNotContains(resposta, 'name="form-0-estoque_atual"')
+        self.assertContains(resposta, '<td class="field-estoque_disponivel">6</td>')
+
+    def test_salvar_nao_desfaz_a_consolidacao(self):
+        velho = Produto.objects.get(pk=self.produto.pk)  # lido antes de consolidar
+        consolidar_deltas()
+
+        velho.nome = "Renomeado"
+        ProdutoAdmin(Produto, admin.site).save_model(None, velho, None, change=True)
+
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.nome, self.produto.estoque_atual), ("Renomeado", 6))
+
+    def test_lista_editavel_salva_o_preco_e_ignora_o_estoque(self):
+        resposta = self.client.post(reverse("admin:estoque_produto_changelist"), {
+            "form-TOTAL_FORMS": "1",
+            "form-INITIAL_FORMS": "1",
+            "form-0-id": str(self.produto.pk),
+            "form-0-preco_venda": "25.00",
+            "form-0-estoque_atual": "999",
+            "_save": "Salvar",
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.preco_venda, self.produto.estoque_atual), (Decimal("25.00"), 10))
+
+
+# =========================
+# PAGINAÇÃO POR CURSOR
+# =========================
+class PaginaKeysetTests(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        produto = _produto(self.adega, Categoria.objects.create(nome="Tintos"))
+        # bulk_create não passa pelo save(): não mexe no estoque
+        Movimentacao.objects.bulk_create([
+            Movimentacao(adega=self.adega, produto=produto, tipo="SAIDA", quantidade=1)
+            for _ in range(TAMANHO_PADRAO + 10)
+        ])
+        self.movs = Movimentacao.objects.filter(adega=self.adega)
+
+    def test_mesma_data_nao_repete_nem_pula(self):
+        self.movs.update(data=timezone.now())
+        vistos, cursor = [], None
+        while True:
+            itens, cursor = pagina_keyset(self.movs, cursor, tamanho=7)
+            vistos += [m.pk for m in itens]
+            if cursor is None:
+                break
+        esperado = list(self.movs.order_by("-id").values_list("id", flat=True))
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido_volta_pra_primeira_pagina(self):
+        primeira, _ = pagina_keyset(self.movs, None, tamanho=3)
+        for cursor in ("lixo!!", "bm9uc2Vuc2U", "²"):
+            itens, _ = pagina_keyset(self.movs, cursor, tamanho=3)
+            self.assertEqual([m.pk for m in itens], [m.pk for m in primeira])
+
+    def test_limite_invalido_usa_o_padrao(self):
+        self.client.force_login(_usuario())
+        for limite in ("²", "abc", "-5", "0", ""):
+            resposta = self.client.get(reverse("api_movimentacoes"), {"limite": limite})
+            self.assertEqual(resposta.status_code, 200, limite)
+            self.assertEqual(len(resposta.json()["resultados"]), TAMANHO_PADRAO, limite)
+
+    def test_limite_valido_e_respeitado(self):
+        self.client.force_login(_usuario())
+        resposta = self.client.get(reverse("api_movimentacoes"), {"limite": "5"})
+        self.assertEqual(len(resposta.json()["resultados"]), 5)
+
+
+# =========================
+# REGRAS DE PREÇO
+# =========================
+class RegraPrecoTests(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        self.categoria = Categoria.objects.create(nome="Cervejas")
+
+    def _preco(self, regra, custo):
+        produto = _produto(self.adega, self.categoria, preco_custo=Decimal(custo))
+        return (
+            Produto.objects.filter(pk=produto.pk)
+            .annotate(preco_novo=preco_da_regra(regra))
+            .values_list("preco_novo", flat=True)
+            .get()
+        )
+
+    def test_final_sobe_ate_o_proximo_x90(self):
+        regra = RegraPreco(categoria=self.categoria, markup=0, final_centavos=Decimal("0.90"))
+        self.assertEqual(self._preco(regra, "10.50"), Decimal("10.90"))
+        self.assertEqual(self._preco(regra, "10.95"), Decimal("11.90"))
+        self.assertEqual(self._preco(regra, "10.90"), Decimal("10.90"))
+
+    def test_sem_final_arredonda_centavos(self):
+        regra = RegraPreco(categoria=self.categoria, markup=Decimal("35"))
+        self.assertEqual(self._preco(regra, "10.00"), Decimal("13.50"))
+
+    def test_regra_da_adega_vence_a_global(self):
+        outra = Adega.objects.create(nome="Filial")
+        _produto(self.adega, self.categoria)
+        _produto(outra, self.categoria)
+        global_ = RegraPreco.objects.create(categoria=self.categoria, markup=10)
+        propria = RegraPreco.objects.create(categoria=self.categoria, adega=outra, markup=50)
+
+        self.assertEqual(list(produtos_da_regra(global_).values_list("adega", flat=True)), [self.adega.pk])
+        self.assertEqual(list(produtos_da_regra(propria).values_list("adega", flat=True)), [outra.pk])
+
+    def test_aplicar_grava_preco_e_historico(self):
+        produto = _produto(self.adega, self.categoria, preco_custo=Decimal("10.00"))
+        regra = RegraPreco.objects.create(categoria=self.categoria, markup=50, final_centavos=Decimal("0.90"))
+
+        self.assertEqual(aplicar_regra(regra), 1)
+        produto.refresh_from_db()
+        self.assertEqual(produto.preco_venda, Decimal("15.90"))
+        self.assertEqual(
+            list(HistoricoPreco.objects.values_list("preco_anterior", "preco_novo")),
+            [(Decimal("20.00"), Decimal("15.90"))],
+        )
+        self.assertEqual(aplicar_regra(regra), 0)  # já está no preço da regra
+
+    def test_aplicar_em_lotes_com_uma_versao_por_lote(self):
+        produtos = [_produto(self.adega, self.categoria) for _ in range(5)]
+        regra = RegraPreco.objects.create(categoria=self.categoria, markup=50)
+
+        with patch("estoque.precificacao.LOTE_PRODUTOS", 2):
+            self.assertEqual(aplicar_regra(regra), 5)
+        self.assertEqual(HistoricoPreco.objects.count(), 5)
+        versoes = Produto.objects.filter(pk__in=[p.pk for p in produtos]).values_list("versao", flat=True)
+        self.assertEqual(len(set(versoes)), 3)
+        self.assertFalse(Produto.objects.exclude(preco_venda=Decimal("15.00")).exists())
+
+    def test_valores_invalidos(self):
+        regra = RegraPreco(categoria=self.categoria, markup=Decimal("-1"), final_centavos=Decimal("1.00"))
+        with self.assertRaises(ValidationError) as erro:
+            regra.full_clean()
+        self.assertEqual(sorted(erro.exception.message_dict), ["final_centavos", "markup"])
+
+    def test_uma_regra_ativa_por_escopo(self):
+        RegraPreco.objects.create(categoria=self.categoria, markup=10)
+        RegraPreco.objects.create(categoria=self.categoria, adega=self.adega, markup=10)
+        # Inativas podem repetir
+        RegraPreco.objects.create(categoria=self.categoria, markup=20, ativa=False)
+        RegraPreco.objects.create(categoria=self.categoria, adega=self.adega, markup=20, ativa=False)
+
+        for adega in (None, self.adega):
+            with self.subTest(adega=adega), self.assertRaises(IntegrityError), transaction.atomic():
+                RegraPreco.objects.create(categoria=self.categoria, adega=adega, markup=30)
+
+    def test_admin_nao_aplica_regra_inativa(self):
+        produto = _produto(self.adega, self.categoria)
+        RegraPreco.objects.create(categoria=self.categoria, markup=50, ativa=False)
+        self.client.force_login(_usuario("gerente", is_staff=True, is_superuser=True))
+
+        resposta = self.client.post(
+            reverse("admin:estoque_regrapreco_changelist"),
+            {"action": "aplicar_precos", "_selected_action": list(RegraPreco.objects.values_list("pk", flat=True))},
+            follow=True,
+        )
+
+        self.assertContains(resposta, "regra inativa, não aplicada")
+        produto.refresh_from_db()
+        self.assertEqual(produto.preco_venda, Decimal("20.00"))
+        self.assertFalse(HistoricoPreco.objects.exists())
+
+
+# =========================
+# CATÁLOGO (snapshot / delta)
+# =========================
+class CatalogoTests(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        self.categoria = Categoria.objects.create(nome="Destilados")
+        self.produto = _produto(self.adega, self.categoria, codigo_barras="789")
+        self.client.force_login(_usuario())
+
+    def test_snapshot_e_304_sem_mudancas(self):
+        resposta = self.client.get(reverse("api_catalogo"))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn([self.produto.pk, "789", "Vinho", "20.00"], resposta.json()["produtos"])
+
+        de_novo = self.client.get(reverse("api_catalogo"), HTTP_IF_NONE_MATCH=resposta["ETag"])
+        self.assertEqual(de_novo.status_code, 304)
+
+        self.produto.nome = "Cachaça"
+        self.produto.save()
+        mudou = self.client.get(reverse("api_catalogo"), HTTP_IF_NONE_MATCH=resposta["ETag"])
+        self.assertEqual(mudou.status_code, 200)
+
+    def test_etag_fraca_vale_com_e_sem_gzip(self):
+        for i in range(20):  # abaixo de 200 bytes o gzip_page não comprime
+            _produto(self.adega, self.categoria, codigo_barras=f"100{i}")
+        comprimido = self.client.get(reverse("api_catalogo"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(comprimido["Content-Encoding"], "gzip")
+        self.assertTrue(comprimido["ETag"].startswith('W/"'))
+
+        puro = self.client.get(reverse("api_catalogo"), HTTP_IF_NONE_MATCH=comprimido["ETag"])
+        self.assertEqual(puro.status_code, 304)
+
+    def test_delta_traz_alterados_e_removidos(self):
+        versao = self.client.get(reverse("api_catalogo")).json()["versao"]
+        parado = _produto(self.adega, self.categoria, codigo_barras="111")
+        removido = _produto(self.adega, self.categoria, codigo_barras="222")
+        versao_meio = self.client.get(reverse("api_catalogo")).json()["versao"]
+
+        self.produto.nome = "Cachaça"
+        self.produto.save()
+        removido_id = removido.pk
+        removido.delete()
+
+        delta = self.client.get(reverse("api_catalogo_mudancas"), {"desde": versao_meio}).json()
+        self.assertEqual([p[0] for p in delta["alterados"]], [self.produto.pk])
+        self.assertEqual(delta["removidos"], [removido_id])
+        self.assertGreater(delta["versao"], versao_meio)
+
+        desde_inicio = self.client.get(reverse("api_catalogo_mudancas"), {"desde": versao}).json()
+        self.assertIn(parado.pk, [p[0] for p in desde_inicio["alterados"]])
+
+    def test_desde_invalido_da_400(self):
+        for desde in ("", "abc", "²"):
+            resposta = self.client.get(reverse("api_catalogo_mudancas"), {"desde": desde})
+            self.assertEqual(resposta.status_code, 400, desde)
+
+    def test_contador_sumido_e_recriado_sem_voltar_atras(self):
+        antes = self.client.get(reverse("api_catalogo")).json()["versao"]
+        SequenciaCatalogo.objects.all().delete()
+        self.produto.nome = "Cachaça"
+        self.produto.save()
+        self.assertGreater(self.produto.versao, antes)
+
+
+# =========================
+# FILA DE JOBS
+# =========================
+class FilaJobsTestCase(TestCase):
+    def setUp(self):
+        self.adega = Adega.objects.first()
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        ajuste = override_settings(JOBS_DIR=self.pasta)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+
+class TarefasTests(FilaJobsTestCase):
+    def test_job_pego_por_um_worker_so(self):
+        job = enfileirar("relatorio_movimentacoes", self.adega)
+
+        pego = pegar_proximo("A")
+        self.assertEqual(pego.pk, job.pk)
+        self.assertEqual((pego.status, pego.worker, pego.tentativas), ("RODANDO", "A", 1))
+        self.assertIsNone(pegar_proximo("B"))
+
+    def test_falha_reenfileira_com_espera_e_depois_desiste(self):
+        job = enfileirar("relatorio_movimentacoes", self.adega)
+
+        for tentativa in range(1, job.max_tentativas + 1):
+            Job.objects.filter(pk=job.pk).update(executar_apos=timezone.now())
+            pego = pegar_proximo("A")
+            self.assertEqual(pego.tentativas, tentativa)
+            _falhou(pego, "boom")
+            if tentativa < job.max_tentativas:
+                self.assertIsNone(pegar_proximo("A"))  # ainda esperando o retry
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.erro), ("ERRO", "boom"))
+
+    def test_travado_volta_pra_fila(self):
+        enfileirar("relatorio_movimentacoes", self.adega)
+        pego = pegar_proximo("A")
+        Job.objects.filter(pk=pego.pk).update(heartbeat=timezone.now() - timedelta(hours=1))
+
+        reenfileirar_travados()
+        pego.refresh_from_db()
+        self.assertEqual(pego.status, "PENDENTE")
+
+    def test_execucao_antiga_nao_sobrescreve_a_nova(self):
+        job = enfileirar("relatorio_movimentacoes", self.adega)
+        antiga = pegar_proximo("A")
+        Job.objects.filter(pk=job.pk).update(status="PENDENTE")  # reenfileirado por timeout
+        nova = pegar_proximo("B")
+
+        executar(antiga)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), ("RODANDO", "B"))
+
+        executar(nova)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "CONCLUIDO")
+        self.assertEqual([p.name for p in self.pasta.iterdir()], [job.arquivo])
+
+    def test_apaga_arquivos_expirados(self):
+        velho, novo = (enfileirar("relatorio_movimentacoes", self.adega) for _ in range(2))
+        for _ in range(2):
+            executar(pegar_proximo("A"))
+        Job.objects.filter(pk=velho.pk).update(
+            concluido_em=timezone.now() - timedelta(hours=settings.JOBS_RETENCAO_HORAS + 1)
+        )
+        arquivo_velho = Job.objects.get(pk=velho.pk).arquivo
+
+        self.assertEqual(apagar_expirados(), 1)
+
+        velho.refresh_from_db()
+        novo.refresh_from_db()
+        self.assertEqual(velho.arquivo, "")
+        self.assertFalse((self.pasta / arquivo_velho).exists())
+        self.assertTrue((self.pasta / novo.arquivo).exists())
+
+    def test_run_worker_processa_a_fila_e_sai(self):
+        jobs = [enfileirar("relatorio_movimentacoes", self.adega) for _ in range(2)]
+
+        # close_old_connections fecharia a conexão da transação do teste
+        with patch("estoque.management.commands.run_worker.close_old_connections"):
+            call_command("run_worker", uma_vez=True, stdout=StringIO())
+
+        self.assertEqual(
+            list(Job.objects.filter(pk__in=[j.pk for j in jobs]).values_list("status", flat=True)),
+            ["CONCLUIDO", "CONCLUIDO"],
+        )
+        self.assertFalse(Worker.objects.exists())  # saiu e tirou o registro
+
+
+class RelatorioJobViewsTests(FilaJobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dono = _usuario("dono")
+        self.client.force_login(self.dono)
+
+    def _pedir(self, **dados):
+        return self.client.post(reverse("gerar_relatorio"), {"tipo": "relatorio_movimentacoes", **dados})
+
+    def test_sem_worker_baixa_direto(self):
+        resposta = self._pedir()
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), {"download_url": reverse("baixar_relatorio")})
+        self.assertFalse(Job.objects.exists())
+
+    def test_sem_worker_analise_abc_leva_o_periodo(self):
+        self.client.force_login(_usuario("gerente", is_staff=True))
+        resposta = self._pedir(tipo="analise_abc", data_inicio="2024-01-01", data_fim="2024-01-31")
+        self.assertEqual(
+            resposta.json()["download_url"],
+            reverse("baixar_analise_abc") + "?data_inicio=2024-01-01&data_fim=2024-01-31",
+        )
+
+    def test_com_worker_enfileira_acompanha_e_baixa(self):
+        registrar_worker("A")
+        resposta = self._pedir()
+        self.assertEqual(resposta.status_code, 202)
+        job = Job.objects.get()
+        self.assertEqual(job.usuario, self.dono)
+
+        status = self.client.get(resposta.json()["status_url"]).json()
+        self.assertEqual((status["status"], status["download_url"]), ("PENDENTE", None))
+        self.assertEqual(self.client.get(reverse("baixar_job", args=[job.pk])).status_code, 404)
+
+        executar(pegar_proximo("A"))
+        status = self.client.get(resposta.json()["status_url"]).json()
+        self.assertEqual(status["status"], "CONCLUIDO")
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).decode("utf-8").startswith("\ufeffData e Hora"))
+
+    def test_worker_parado_nao_conta(self):
+        Worker.objects.create(nome="A", visto_em=timezone.now() - timedelta(seconds=settings.WORKER_VIVO_SEGUNDOS + 1))
+        self.assertEqual(self._pedir().status_code, 200)
+
+    def test_job_de_outro_usuario_nao_aparece(self):
+        job = enfileirar("relatorio_movimentacoes", self.adega, self.dono)
+        executar(pegar_proximo("A"))
+
+        self.client.force_login(_usuario("intruso"))
+        self.assertEqual(self.client.get(reverse("status_job", args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("baixar_job", args=[job.pk])).status_code, 404)
+
+        self.client.force_login(_usuario("gerente", is_staff=True))
+        self.assertEqual(self.client.get(reverse("status_job", args=[job.pk])).status_code, 200)
+
+    def test_expirado(self):
+        job = enfileirar("relatorio_movimentacoes", self.adega, self.dono)
+        executar(pegar_proximo("A"))
+        Job.objects.filter(pk=job.pk).update(arquivo="")
+
+        status = self.client.get(reverse("status_job", args=[job.pk])).json()
+        self.assertEqual((status["status"], status["download_url"]), ("EXPIRADO", None))
+        self.assertEqual(self.client.get(reverse("baixar_job", args=[job.pk])).status_code, 404)
@@ -17,11 +17,24 @@ urlpatterns = [
     path("relatorios/estoque-baixo/", views.estoque_baixo, name="estoque_baixo"),
     path("relatorios/vendas-hoje/", views.vendas_hoje, name="vendas_hoje"),
     path("relatorios/vendas-periodo/", views.vendas_periodo, name="vendas_periodo"),
+    path("relatorios/historico/", views.historico_movimentacoes, name="historico_movimentacoes"),
+    path("relatorios/analise-abc/", views.analise_abc, name="analise_abc"),
+    path("relatorios/analise-abc/baixar/", views.baixar_analise_abc, name="baixar_analise_abc"),
 
     # Ações do relatório
     path("relatorio/baixar/", views.baixar_relatorio, name="baixar_relatorio"),
     path("relatorio/limpar/", views.limpar_relatorio, name="limpar_relatorio"),
 
+    # Relatórios em segundo plano
+    path("relatorio/gerar/", views.gerar_relatorio, name="gerar_relatorio"),
+    path("relatorio/job/<int:pk>/", views.status_job, name="status_job"),
+    path("relatorio/job/<int:pk>/baixar/", views.baixar_job, name="baixar_job"),
+
+    # API
+    path("api/movimentacoes/", views.api_movimentacoes, name="api_movimentacoes"),
+    path("api/catalogo/", views.api_catalogo, name="api_catalogo"),
+    path("api/catalogo/mudancas/", views.api_catalogo_mudancas, name="api_catalogo_mudancas"),
+
     # 🔐 GATE DO ADMIN
     path("admin-gate-check/", views.admin_gate_check, name="admin_gate_check"),
 ]
\ No newline at end of file
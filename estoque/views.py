@@ -1,17 +1,28 @@
-import csv
 import requests
 from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import urlencode
 from django.db.models import Q
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_POST
 from django.conf import settings
-from django.contrib.auth.decorators import login_required
-from .models import Adega, Produto, Movimentacao, Categoria
+from django.contrib.auth.decorators import login_required, user_passes_test
+from .analise import curva_abc
+from .catalogo import mudancas, snapshot, versao_atual
+from .exportacao import csv_movimentacoes_em_partes, escrever_csv_analise_abc
+from .forms import FiltroMovimentacoesForm, FiltroPeriodoVendasForm
+from .models import Adega, Produto, Movimentacao, Categoria, Job
+from .paginacao import TAMANHO_MAXIMO, TAMANHO_PADRAO, pagina_keyset
+from .routers import fixar_primario, ler_da_replica
+from .tarefas import TAREFAS, enfileirar, worker_ativo
 
 # --- HELPERS ---
 def _to_decimal(value):
@@ -21,6 +32,18 @@ def _to_decimal(value):
     except:
         return Decimal("0.00")
 
+def _eh_staff(user):
+    return user.is_staff
+
+def _periodo(dados):
+    """Período do filtro (padrão: últimos 7 dias)."""
+    form = FiltroPeriodoVendasForm(dados or None)
+    hoje = timezone.localdate()
+    limpos = form.cleaned_data if form.is_bound and form.is_valid() else {}
+    inicio = limpos.get("data_inicio") or hoje - timedelta(days=7)
+    fim = limpos.get("data_fim") or hoje
+    return form, inicio, fim
+
 def get_adega_atual(request):
     try:
         adega = Adega.objects.first()
@@ -65,11 +88,12 @@ def entrada_codigo_barras(request):
 
     if request.method == "POST" and codigo:
         try:
-            produto = Produto.objects.get(adega=adega, codigo_barras=codigo)
+            produto = Produto.objects.com_estoque().get(adega=adega, codigo_barras=codigo)
             if acao == "salvar":
                 qtd_raw = request.POST.get("quantidade", "1").strip()
                 quantidade = int(qtd_raw) if qtd_raw.isdigit() else 1
                 Movimentacao.objects.create(adega=adega, produto=produto, tipo="ENTRADA", quantidade=quantidade)
+                fixar_primario(request)
                 messages.success(request, f"✅ Entrada: {produto.nome} (+{quantidade})")
                 return redirect("entrada_codigo")
         except Produto.DoesNotExist:
@@ -93,16 +117,17 @@ def saida_codigo_barras(request):
 
     if request.method == "POST" and codigo:
         try:
-            produto = Produto.objects.get(adega=adega, codigo_barras=codigo)
+            produto = Produto.objects.com_estoque().get(adega=adega, codigo_barras=codigo)
             if acao == "salvar":
                 qtd_raw = request.POST.get("quantidade", "1").strip()
                 quantidade = int(qtd_raw) if qtd_raw.isdigit() else 1
                 
-                if produto.estoque_atual < quantidade:
+                if produto.estoque_disponivel < quantidade:
                     messages.error(request, "❌ Estoque insuficiente!")
                 else:
                     valor_total = produto.preco_venda * quantidade
                     Movimentacao.objects.create(adega=adega, produto=produto, tipo="SAIDA", quantidade=quantidade)
+                    fixar_primario(request)
                     messages.success(request, f"✅ Venda: {produto.nome} | Total: R$ {valor_total:.2f}")
                     return redirect("saida_codigo")
         except Produto.DoesNotExist:
@@ -127,6 +152,7 @@ def novo_produto(request):
             preco_venda=_to_decimal(request.POST.get("preco_venda")),
             estoque_atual=int(request.POST.get("estoque_atual") or 0)
         )
+        fixar_primario(request)
         messages.success(request, "✅ Produto cadastrado com sucesso!")
         return redirect(onde_voltar)
 
@@ -137,64 +163,233 @@ def novo_produto(request):
 def consultar_estoque(request):
     termo = request.GET.get('q', '').strip()
     adega = get_adega_atual(request)
-    produtos = Produto.objects.filter(Q(adega=adega) & (Q(nome__icontains=termo) | Q(codigo_barras__icontains=termo)))[:10]
-    dados = [{"nome": p.nome, "estoque": p.estoque_atual} for p in produtos]
+    produtos = Produto.objects.com_estoque().filter(Q(adega=adega) & (Q(nome__icontains=termo) | Q(codigo_barras__icontains=termo)))[:10]
+    dados = [{"nome": p.nome, "estoque": p.estoque_disponivel} for p in produtos]
     return JsonResponse(dados, safe=False)
 
 @login_required
+@ler_da_replica
 def relatorios(request):
     movs = Movimentacao.objects.filter(adega=get_adega_atual(request)).order_by("-data")[:100]
     for m in movs:
         m.valor_total_snapshot = m.quantidade * m.produto.preco_venda
     return render(request, "estoque/relatorios.html", {"movimentacoes": movs})
 
+def _movimentacoes_filtradas(request):
+    """Movimentações da adega com os filtros do histórico (tipo, produto, período)."""
+    form = FiltroMovimentacoesForm(request.GET)
+    movs = Movimentacao.objects.filter(adega=get_adega_atual(request)).select_related("produto")
+    if not form.is_valid():
+        return form, movs
+
+    filtros = form.cleaned_data
+    if filtros["tipo"]:
+        movs = movs.filter(tipo=filtros["tipo"])
+    if filtros["produto"]:
+        movs = movs.filter(produto_id=filtros["produto"])
+    if filtros["codigo_barras"]:
+        movs = movs.filter(produto__codigo_barras=filtros["codigo_barras"])
+    # Intervalo em data/hora (e não data__date) pra usar o índice
+    if filtros["data_inicio"]:
+        movs = movs.filter(data__gte=timezone.make_aware(datetime.combine(filtros["data_inicio"], time.min)))
+    if filtros["data_fim"]:
+        fim = filtros["data_fim"] + timedelta(days=1)
+        movs = movs.filter(data__lt=timezone.make_aware(datetime.combine(fim, time.min)))
+    return form, movs
+
+def _inteiro(valor):
+    # int() direto: isdigit() aceita "²" e o int() estouraria num 500
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _tamanho_pagina(request):
+    limite = _inteiro(request.GET.get("limite"))
+    return min(limite, TAMANHO_MAXIMO) if limite and limite > 0 else TAMANHO_PADRAO
+
 @login_required
+@ler_da_replica
+def historico_movimentacoes(request):
+    form, movs = _movimentacoes_filtradas(request)
+    itens, proximo = pagina_keyset(movs, request.GET.get("cursor"), _tamanho_pagina(request))
+    for m in itens:
+        m.valor_total_snapshot = m.quantidade * m.produto.preco_venda
+
+    filtros = request.GET.copy()
+    filtros.pop("cursor", None)
+    if proximo:
+        filtros["cursor"] = proximo
+
+    return render(request, "estoque/historico.html", {
+        "form": form,
+        "movimentacoes": itens,
+        "proxima_url": f"?{filtros.urlencode()}" if proximo else None,
+        "primeira_pagina": not request.GET.get("cursor"),
+    })
+
+@login_required
+@ler_da_replica
+def api_movimentacoes(request):
+    form, movs = _movimentacoes_filtradas(request)
+    if not form.is_valid():
+        return JsonResponse({"erros": form.errors}, status=400)
+
+    itens, proximo = pagina_keyset(movs, request.GET.get("cursor"), _tamanho_pagina(request))
+    return JsonResponse({
+        "resultados": [
+            {
+                "id": m.pk,
+                "data": m.data.isoformat(),
+                "tipo": m.tipo,
+                "produto_id": m.produto_id,
+                "produto": m.produto.nome,
+                "quantidade": m.quantidade,
+                "observacao": m.observacao,
+            }
+            for m in itens
+        ],
+        "proximo_cursor": proximo,
+    })
+
+@login_required
+@ler_da_replica
 def baixar_relatorio(request):
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    movimentacoes = Movimentacao.objects.filter(adega=get_adega_atual(request)).order_by("-data")
+    # O CSV é gerado depois que a view retorna (fora do @ler_da_replica): fixa o banco agora
+    movimentacoes = movimentacoes.using(movimentacoes.db)
+
+    response = StreamingHttpResponse(
+        csv_movimentacoes_em_partes(movimentacoes), content_type='text/csv; charset=utf-8'
+    )
     data_arquivo = timezone.now().strftime('%d_%m_%Y')
     response['Content-Disposition'] = f'attachment; filename="relatorio_adega_{data_arquivo}.csv"'
-    
-    writer = csv.writer(response, delimiter=';')
-    response.write(u'\ufeff'.encode('utf8'))
-    
-    writer.writerow(['Data e Hora', 'Produto', 'Tipo', 'Quantidade', 'Preço Unit.', 'Valor Total'])
-    
-    movimentacoes = Movimentacao.objects.filter(adega=get_adega_atual(request)).order_by("-data")
-    faturamento_total = Decimal("0.00")
-    
-    for m in movimentacoes:
-        valor_operacao = m.quantidade * m.produto.preco_venda
-        if m.tipo == 'SAIDA':
-            faturamento_total += valor_operacao
-            
-        writer.writerow([
-            m.data.strftime('%d/%m/%Y %H:%M'),
-            m.produto.nome,
-            m.tipo,
-            m.quantidade,
-            f"{m.produto.preco_venda:.2f}".replace('.', ','),
-            f"{valor_operacao:.2f}".replace('.', ',')
-        ])
-    
-    writer.writerow([])
-    writer.writerow(['', '', '', '', 'FATURAMENTO TOTAL:', f"R$ {faturamento_total:.2f}".replace('.', ',')])
-    
     return response
 
 @login_required
+@ler_da_replica
 def estoque_baixo(request):
-    produtos = Produto.objects.filter(adega=get_adega_atual(request), estoque_atual__lte=5)
+    produtos = Produto.objects.com_estoque().filter(adega=get_adega_atual(request), estoque_disponivel__lte=5)
     return render(request, "estoque/estoque_baixo.html", {"produtos": produtos})
 
 @login_required
+@ler_da_replica
 def vendas_hoje(request):
     vendas = Movimentacao.objects.filter(adega=get_adega_atual(request), tipo="SAIDA", data__date=timezone.now().date())
     total = sum(v.quantidade * v.produto.preco_venda for v in vendas)
     return render(request, "estoque/vendas_hoje.html", {"vendas": vendas, "total_valor": total})
 
+@login_required
+@user_passes_test(_eh_staff)
+@ler_da_replica
+def analise_abc(request):
+    form, inicio, fim = _periodo(request.GET)
+    linhas = curva_abc(get_adega_atual(request), inicio, fim)
+    return render(request, "estoque/analise_abc.html", {
+        "form": form,
+        "data_inicio": inicio,
+        "data_fim": fim,
+        "linhas": linhas,
+    })
+
+@login_required
+@user_passes_test(_eh_staff)
+@ler_da_replica
+def baixar_analise_abc(request):
+    _, inicio, fim = _periodo(request.GET)
+    linhas = curva_abc(get_adega_atual(request), inicio, fim)
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="curva_abc_{inicio:%d_%m_%Y}_a_{fim:%d_%m_%Y}.csv"'
+    )
+
+    escrever_csv_analise_abc(response, linhas)
+
+    return response
+
+# --- CATÁLOGO PARA O CAIXA (sync local dos códigos de barras) ---
+def _etag_catalogo(request):
+    adega = get_adega_atual(request)
+    desde = request.GET.get("desde", "")
+    # ETag fraca: a mesma versão sai com ou sem gzip, com bytes diferentes
+    return f'W/"catalogo-{adega.pk}-{versao_atual(adega)}-{desde}"'
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_catalogo)
+@gzip_page
+def api_catalogo(request):
+    return JsonResponse(snapshot(get_adega_atual(request)))
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_catalogo)
+@gzip_page
+def api_catalogo_mudancas(request):
+    desde = _inteiro(request.GET.get("desde"))
+    if desde is None:
+        return JsonResponse({"erro": "Informe ?desde=<versão>"}, status=400)
+    return JsonResponse(mudancas(get_adega_atual(request), desde))
+
+# --- RELATÓRIOS EM SEGUNDO PLANO (fila de jobs) ---
+@login_required
+@require_POST
+def gerar_relatorio(request):
+    tipo = request.POST.get("tipo", "relatorio_movimentacoes")
+    if tipo not in TAREFAS or (tipo == "analise_abc" and not request.user.is_staff):
+        return JsonResponse({"erro": "Relatório inválido"}, status=400)
+
+    parametros = {}
+    if tipo == "analise_abc":
+        _, inicio, fim = _periodo(request.POST)
+        parametros = {"data_inicio": inicio.isoformat(), "data_fim": fim.isoformat()}
+
+    if not worker_ativo():
+        # Nenhum run_worker rodando: o job ficaria PENDENTE pra sempre. Baixa direto.
+        if tipo == "analise_abc":
+            url = f"{reverse('baixar_analise_abc')}?{urlencode(parametros)}"
+        else:
+            url = reverse("baixar_relatorio")
+        return JsonResponse({"download_url": url})
+
+    job = enfileirar(tipo, get_adega_atual(request), request.user, **parametros)
+    return JsonResponse({"id": job.pk, "status_url": f"/relatorio/job/{job.pk}/"}, status=202)
+
+def _job_do_usuario(request, pk):
+    jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(usuario=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+@login_required
+def status_job(request, pk):
+    job = _job_do_usuario(request, pk)
+    expirado = job.status == "CONCLUIDO" and not job.arquivo
+    return JsonResponse({
+        "id": job.pk,
+        "status": "EXPIRADO" if expirado else job.status,
+        "progresso": job.progresso,
+        "tentativas": job.tentativas,
+        "download_url": f"/relatorio/job/{job.pk}/baixar/" if job.status == "CONCLUIDO" and not expirado else None,
+        "erro": job.erro.strip().splitlines()[-1] if job.status == "ERRO" and job.erro else None,
+    })
+
+@login_required
+def baixar_job(request, pk):
+    job = _job_do_usuario(request, pk)
+    if job.status != "CONCLUIDO":
+        raise Http404("Relatório ainda não está pronto.")
+    caminho = settings.JOBS_DIR / job.arquivo
+    if not job.arquivo or not caminho.exists():
+        raise Http404("Relatório expirou; gere de novo.")
+
+    _, prefixo = TAREFAS[job.tipo]
+    nome = f"{prefixo}_{job.concluido_em:%d_%m_%Y}.csv"
+    return FileResponse(open(caminho, "rb"), as_attachment=True, filename=nome, content_type="text/csv; charset=utf-8")
+
 @login_required
 def limpar_relatorio(request):
     Movimentacao.objects.filter(adega=get_adega_atual(request)).delete()
+    fixar_primario(request)
     return redirect("relatorios")
 
 @csrf_exempt